@@ -0,0 +1,261 @@
+# Calcul de Bhuddabrot par échantillonnage préférentiel (algorithme de Metropolis-Hastings)
+#
+# Tirés uniformément dans le disque de rayon 2, la plupart des échantillons c ne divergent pas ou divergent
+# tout de suite et n'apportent rien à l'image, surtout si l'on ne veut qu'une sous-fenêtre du plan.
+# Chaque processus fait donc évoluer des chaînes de Markov dont les états sont tirés selon la densité g(c)u(c), où
+#     g(c) = f(c)^exponent, f(c) étant le nombre de points de l'orbite de c tombant dans la fenêtre
+#            (g(c) = 0 si c ne contribue pas),
+#     u(c) = densité du tirage de référence (rayon et angle uniformes, donc proportionnelle à 1/|c|),
+# par petites mutations (gaussiennes) des échantillons qui contribuent et, de temps en temps, par un tirage
+# selon u (pour ne pas rester piégé), chaque proposition étant acceptée selon la règle de Metropolis-Hastings.
+# Pour que l'image reste celle du tirage de référence, chaque état dépose son orbite avec le poids 1/g(c)
+# multiplié par le nombre de pas que la chaîne y a passés (dépôt fait quand la chaîne quitte l'état).
+#
+# Exemple : mpiexec -n 4 python mpi_bhudda_metropolis.py            (échantillonnage préférentiel)
+#           mpiexec -n 4 python mpi_bhudda_metropolis.py uniform    (tirage uniforme, pour comparer)
+import numpy as np
+from dataclasses import dataclass
+from PIL import Image
+from math import pi
+from time import time
+from mpi4py import MPI
+import sys
+
+twoPi = 2.*pi
+
+@dataclass
+class View:
+    """
+    Fenêtre [xmin, xmax] x [ymin, ymax] du plan complexe rendue dans une image (width, height)
+    """
+    xmin: float
+    xmax: float
+    ymin: float
+    ymax: float
+    width : int
+    height: int
+
+def in_cardioid_or_bulb(c : np.ndarray) -> np.ndarray:
+    """
+    Vrai pour les points de la cardioïde principale ou du bulbe de période 2 (intérieurs à l'ensemble)
+    """
+    x, y2 = c.real, c.imag*c.imag
+    q = (x-0.25)*(x-0.25) + y2
+    return (q*(q + x - 0.25) <= 0.25*y2) | ((x+1.)*(x+1.) + y2 <= 0.0625)
+
+@dataclass
+class MandelbrotSet:
+    max_iterations: int
+    min_iterations: int   = 0
+    escape_radius : float = 2.0
+
+    def count_iterations(self, c: np.ndarray) -> np.ndarray:
+        """
+        Nombre d'itérations avant divergence de chaque échantillon de c (max_iterations s'il ne diverge pas).
+        Tous les échantillons sont itérés ensemble ; on ne garde à chaque itération que ceux encore bornés.
+        Les échantillons de la cardioïde principale et du bulbe de période 2 ne divergent jamais : ils sont
+        rejetés sans être itérés (ce sont les plus coûteux, itérés jusqu'à max_iterations).
+        """
+        radius2 = self.escape_radius*self.escape_radius
+        niter = np.full(c.size, self.max_iterations, dtype=np.int64)
+        live  = np.flatnonzero(~in_cardioid_or_bulb(c))
+        cl    = c[live]
+        z     = cl.copy()
+        for iter in range(self.max_iterations):
+            np.multiply(z, z, out=z)
+            z += cl
+            has_diverged = z.real*z.real + z.imag*z.imag > radius2
+            if has_diverged.any():
+                niter[live[has_diverged]] = iter
+                keep = ~has_diverged
+                live, cl, z = live[keep], cl[keep], z[keep]
+                if live.size == 0: break
+        return niter
+
+    def orbit_hits(self, c: np.ndarray, niter: np.ndarray, view : View, histogram : np.ndarray = None,
+                   weight : np.ndarray = None, buffer_size : int = 1 << 20) -> np.ndarray:
+        """
+        Renvoie pour chaque échantillon de c le nombre de points de son orbite (niter+1 points c, c²+c, ...)
+        tombant dans la fenêtre view, 0 si son nombre d'itérations avant divergence n'est pas dans
+        [min_iterations, max_iterations[.
+        Si histogram (image (width, height) aplatie, en float64) est donné, on y ajoute aussi ces points,
+        chacun avec le poids weight de son échantillon (1 si weight n'est pas donné).
+        """
+        hits_count = np.zeros(c.size, dtype=np.int64)
+        selected = np.flatnonzero((niter >= self.min_iterations) & (niter < self.max_iterations))
+        # Tri par longueur d'orbite décroissante : au pas k, les orbites encore actives forment un préfixe
+        selected = selected[np.argsort(-niter[selected], kind='stable')]
+        if selected.size == 0: return hits_count
+        c       = c[selected]
+        lengths = niter[selected] + 1
+        w       = np.ones(c.size) if weight is None else weight[selected]
+        count   = np.zeros(c.size, dtype=np.int64)
+        nb_active = np.searchsorted(-lengths, -np.arange(lengths[0]), side='left')
+        scaleX = view.width/(view.xmax-view.xmin)
+        scaleY = view.height/(view.ymax-view.ymin)
+        z    = c.copy()
+        fx   = np.empty(c.size, dtype=np.double)
+        fy   = np.empty(c.size, dtype=np.double)
+        ix   = np.empty(c.size, dtype=np.int64)
+        iy   = np.empty(c.size, dtype=np.int64)
+        mask = np.empty(c.size, dtype=bool)
+        if histogram is not None:
+            hits    = np.empty(max(buffer_size, c.size), dtype=np.int64)
+            weights = np.empty(hits.size, dtype=np.double)
+        nb_hits = 0
+        with np.errstate(over='ignore', invalid='ignore'):
+            for n in nb_active:
+                zn = z[:n]
+                np.subtract(zn.real, view.xmin, out=fx[:n])
+                fx[:n] *= scaleX
+                np.subtract(zn.imag, view.ymin, out=fy[:n])
+                fy[:n] *= scaleY
+                # Le rejeu n'est pas forcément identique bit à bit au comptage (arrondis des boucles vectorisées de
+                # numpy) : une orbite chaotique peut diverger un peu plus tôt et déborder. On ne garde que les points
+                # de l'image (les NaN échouent aux comparaisons).
+                np.less(fx[:n], view.width, out=mask[:n])
+                mask[:n] &= fx[:n] >= 0.
+                mask[:n] &= fy[:n] < view.height
+                mask[:n] &= fy[:n] >= 0.
+                count[:n] += mask[:n]
+                if histogram is not None:
+                    ix[:n] = fx[:n]
+                    iy[:n] = fy[:n]
+                    ix[:n] *= view.height
+                    ix[:n] += iy[:n]
+                    nb_valid = np.count_nonzero(mask[:n])
+                    if nb_hits + nb_valid > hits.size:
+                        histogram += np.bincount(hits[:nb_hits], weights[:nb_hits], minlength=histogram.size)
+                        nb_hits = 0
+                    np.compress(mask[:n], ix[:n], out=hits[nb_hits:nb_hits+nb_valid])
+                    np.compress(mask[:n], w[:n], out=weights[nb_hits:nb_hits+nb_valid])
+                    nb_hits += nb_valid
+                np.multiply(zn, zn, out=zn)
+                zn += c[:n]
+        if histogram is not None:
+            histogram += np.bincount(hits[:nb_hits], weights[:nb_hits], minlength=histogram.size)
+        hits_count[selected] = count
+        return hits_count
+
+def uniform_disk(rng : np.random.Generator, nbSamples : int) -> np.ndarray:
+    # Même loi que mpi_bhudda_set.py : rayon et angle uniformes
+    radius = 2*rng.random(nbSamples)
+    angle  = twoPi*rng.random(nbSamples)
+    return radius*(np.cos(angle)+np.sin(angle)*1j)
+
+def uniform_task(rng, nbSamples : int, mandelbrot_set : MandelbrotSet, view : View, histogram : np.ndarray,
+                 batchSize : int = 4096) -> int:
+    """
+    Échantillonnage uniforme de référence : renvoie le nombre d'échantillons ayant contribué à l'image
+    """
+    nbContributing = 0
+    for first in range(0, nbSamples, batchSize):
+        cArr  = uniform_disk(rng, min(batchSize, nbSamples-first))
+        niter = mandelbrot_set.count_iterations(cArr)
+        nbContributing += np.count_nonzero(mandelbrot_set.orbit_hits(cArr, niter, view, histogram))
+    return nbContributing
+
+def metropolis_task(rng, nbSamples : int, nbChains : int, mandelbrot_set : MandelbrotSet, view : View,
+                    histogram : np.ndarray, burnIn : int = 16, largeStepProbability : float = 0.1,
+                    mutationSize : float = 0.05, exponent : float = 0.5, maxSeedingRounds : int = 64):
+    """
+    Fait évoluer nbChains chaînes de Metropolis-Hastings jusqu'à avoir évalué nbSamples orbites en tout :
+    les tirages des états initiaux et les burnIn pas de chauffe sont décomptés de ce budget, comme les
+    propositions (au moins un pas est fait après la chauffe).
+    mutationSize : écart-type des petites mutations, relatif à la taille de la fenêtre.
+    exponent     : les chaînes suivent la densité f^exponent u (0 : tous les échantillons qui contribuent
+                   sont également probables ; 1 : proportionnellement à leur nombre de points dans la fenêtre).
+    Lève RuntimeError si maxSeedingRounds tirages de nbChains échantillons ne donnent aucun échantillon qui
+    contribue (fenêtre que les orbites ne traversent pas).
+    Renvoie le nombre de propositions acceptées et le nombre d'orbites effectivement évaluées.
+    """
+    sigma = mutationSize*max(view.xmax-view.xmin, view.ymax-view.ymin)
+    # États initiaux : tirages uniformes jusqu'à trouver nbChains/initialDiversity échantillons qui contribuent,
+    # répartis entre les chaînes (les chaînes parties d'un même état se séparent pendant la chauffe)
+    initialDiversity = 16
+    seeds = []
+    nbSeeds = 0
+    nbEvaluated = 0
+    while nbSeeds < max(1, nbChains//initialDiversity):
+        if nbEvaluated == maxSeedingRounds*nbChains:
+            if nbSeeds > 0: break
+            raise RuntimeError(f"Aucun des {nbEvaluated} échantillons tirés ne contribue à la fenêtre {view} : "
+                               "impossible d'initialiser les chaînes")
+        cArr  = uniform_disk(rng, nbChains)
+        niter = mandelbrot_set.count_iterations(cArr)
+        f     = mandelbrot_set.orbit_hits(cArr, niter, view)
+        seeds.append((cArr[f > 0], niter[f > 0], f[f > 0]))
+        nbSeeds += np.count_nonzero(f)
+        nbEvaluated += nbChains
+    choice = np.arange(nbChains) % nbSeeds
+    c, niter, f = (np.concatenate(s)[choice] for s in zip(*seeds))
+    g = f**exponent
+    multiplicity = np.zeros(nbChains, dtype=np.int64)
+    nbSteps = max(1, (nbSamples-nbEvaluated-burnIn*nbChains+nbChains-1)//nbChains)
+    nbEvaluated += (burnIn+nbSteps)*nbChains
+    nbAccepted = 0
+    for step in range(-burnIn, nbSteps):
+        large = rng.random(nbChains) < largeStepProbability
+        proposal = c + sigma*(rng.standard_normal(nbChains)+1.j*rng.standard_normal(nbChains))
+        proposal[large] = uniform_disk(rng, np.count_nonzero(large))
+        niterProposal = mandelbrot_set.count_iterations(proposal)
+        fProposal = mandelbrot_set.orbit_hits(proposal, niterProposal, view)
+        fProposal[np.abs(proposal) > 2.] = 0 # La densité cible est nulle hors du disque de tirage
+        gProposal = np.where(fProposal > 0, fProposal**exponent, 0.)
+        # Tirage selon u : on accepte avec min(1, g'/g) (g = f^exponent).
+        # Petite mutation (symétrique) : on accepte avec min(1, g'u'/(gu)), u(c) étant proportionnelle à 1/|c|.
+        ratio = gProposal.copy()
+        ratio[~large] *= np.abs(c[~large])/np.maximum(np.abs(proposal[~large]), 1.E-300)
+        accept = rng.random(nbChains)*g < ratio
+        if step >= 0:
+            # Une chaîne qui quitte son état y dépose son orbite, pondérée par le nombre de pas passés / g
+            leaving = np.flatnonzero(accept & (multiplicity > 0))
+            mandelbrot_set.orbit_hits(c[leaving], niter[leaving], view, histogram, multiplicity[leaving]/g[leaving])
+            nbAccepted += np.count_nonzero(accept)
+        multiplicity[accept] = 0
+        c[accept], niter[accept], g[accept] = proposal[accept], niterProposal[accept], gProposal[accept]
+        if step >= 0:
+            multiplicity += 1
+    mandelbrot_set.orbit_hits(c, niter, view, histogram, multiplicity/g)
+    return nbAccepted, nbEvaluated
+
+
+globCom = MPI.COMM_WORLD.Dup()
+nbp     = globCom.size
+rank    = globCom.rank
+
+# On peut changer les paramètres des prochaines lignes
+sampling  = sys.argv[1] if len(sys.argv) > 1 else "metropolis"
+view      = View(xmin=-0.1, xmax=0.1, ymin=0.6, ymax=0.8, width=512, height=512) # Sous-fenêtre du plan
+mandelbrot_set = MandelbrotSet(max_iterations=2_000, min_iterations=0)
+nbSamples = 400_000 # Nombre total d'orbites évaluées (tirées, proposées, ou pour l'initialisation et la chauffe)
+nbChains  = 1024    # Nombre de chaînes de Markov par processus
+
+rng = np.random.default_rng([rank, int(time())])
+histogram = np.zeros(view.width*view.height, dtype=np.double)
+nbSamplesLoc = nbSamples//nbp + (1 if rank < nbSamples % nbp else 0)
+deb = time()
+if sampling == "uniform":
+    nbUseful = uniform_task(rng, nbSamplesLoc, mandelbrot_set, view, histogram)
+    nbEvaluated = nbSamplesLoc
+else:
+    try:
+        nbUseful, nbEvaluated = metropolis_task(rng, nbSamplesLoc, nbChains, mandelbrot_set, view, histogram)
+    except RuntimeError as err:
+        print(err)
+        globCom.Abort(-1)
+fin = time()
+nbUseful = globCom.reduce(nbUseful, op=MPI.SUM, root=0)
+nbEvaluated = globCom.reduce(nbEvaluated, op=MPI.SUM, root=0)
+image = np.zeros_like(histogram) if rank == 0 else None
+globCom.Reduce([histogram, MPI.DOUBLE], [image, MPI.DOUBLE], op=MPI.SUM, root=0)
+
+if rank==0:
+    label = "échantillons contribuant" if sampling == "uniform" else "propositions acceptées"
+    print(f"Temps du calcul de Bhuddabrot ({sampling}, {nbEvaluated} orbites évaluées, {nbUseful} {label}) : {fin-deb} secondes")
+    # Constitution de l'image résultante :
+    image = image.reshape((view.width, view.height))
+    stride : int = view.width*view.height
+    scal : float = 16.*stride/np.sum(image)
+    pixels = np.array(np.clip(scal*image,0,255).astype(np.uint8))
+    Image.fromarray(pixels).save(f"bhudda_{sampling}.png")
@@ -6,94 +6,410 @@ from math import pi
 from time import time
 import matplotlib.cm
 from mpi4py import MPI
+import glob
+import json
+import os
 
 twoPi = 2.*pi
 
+def in_cardioid_or_bulb(c : np.ndarray) -> np.ndarray:
+    """
+    Vrai pour les points de la cardioïde principale ou du bulbe de période 2 (intérieurs à l'ensemble)
+    """
+    x, y2 = c.real, c.imag*c.imag
+    q = (x-0.25)*(x-0.25) + y2
+    return (q*(q + x - 0.25) <= 0.25*y2) | ((x+1.)*(x+1.) + y2 <= 0.0625)
+
 @dataclass
 class MandelbrotSet:
     max_iterations: int
     escape_radius : float = 2.0
 
-    def __contains__(self, c: complex) -> bool:
-        return self.stability(c) == 1
+    def count_iterations(self, c: np.ndarray) -> np.ndarray:
+        """
+        Nombre d'itérations avant divergence de chaque échantillon de c (max_iterations s'il ne diverge pas).
+        Tous les échantillons sont itérés ensemble ; on ne garde à chaque itération que ceux encore bornés.
+        Les échantillons de la cardioïde principale et du bulbe de période 2 ne divergent jamais : ils sont
+        rejetés sans être itérés (ce sont les plus coûteux, itérés jusqu'à max_iterations).
+        """
+        radius2 = self.escape_radius*self.escape_radius
+        niter = np.full(c.size, self.max_iterations, dtype=np.int64)
+        live  = np.flatnonzero(~in_cardioid_or_bulb(c))
+        cl    = c[live]
+        z     = cl.copy()
+        for iter in range(self.max_iterations):
+            np.multiply(z, z, out=z)
+            z += cl
+            has_diverged = z.real*z.real + z.imag*z.imag > radius2
+            if has_diverged.any():
+                niter[live[has_diverged]] = iter
+                keep = ~has_diverged
+                live, cl, z = live[keep], cl[keep], z[keep]
+                if live.size == 0: break
+        return niter
+
+    def accumulate_orbits(self, c: np.ndarray, niter: np.ndarray, histogram: np.ndarray, width : int, height : int,
+                          code : np.ndarray = None, buffer_size : int = 1 << 20):
+        """
+        Ajoute à histogram (image (width, height) aplatie) les points des orbites des échantillons de c ayant divergé.
+        Un échantillon divergé après niter itérations a une orbite de niter+1 points (c, c²+c, ...).
+        Si code est donné, histogram contient une image (width, height) aplatie par canal, bout à bout : l'orbite de
+        l'échantillon i est ajoutée à l'image de chaque canal ch dont le bit ch de code[i] est à 1.
+        Les orbites sont itérées ensemble ; les indices des pixels touchés sont rangés dans un tampon préalloué
+        vidé dans l'histogramme (np.bincount) lorsqu'il est plein.
+        """
+        escaped = niter < self.max_iterations
+        if code is not None:
+            escaped &= code > 0
+        # Tri par longueur d'orbite décroissante : au pas k, les orbites encore actives forment un préfixe
+        order   = np.argsort(-niter[escaped], kind='stable')
+        c       = c[escaped][order]
+        lengths = niter[escaped][order] + 1
+        if c.size == 0: return
+        stride  = width*height
+        if code is None:
+            member = np.ones((1, c.size), dtype=bool)
+        else:
+            code   = code[escaped][order]
+            member = np.stack([(code >> ch) & 1 == 1 for ch in range(histogram.size//stride)])
+        nb_active = np.searchsorted(-lengths, -np.arange(lengths[0]), side='left')
+        scaleX = 0.25*width
+        scaleY = 0.25*height
+        z    = c.copy()
+        fx   = np.empty(c.size, dtype=np.double)
+        fy   = np.empty(c.size, dtype=np.double)
+        ix   = np.empty(c.size, dtype=np.int64)
+        iy   = np.empty(c.size, dtype=np.int64)
+        mask = np.empty(c.size, dtype=bool)
+        sel  = np.empty(c.size, dtype=bool)
+        hits = np.empty(max(buffer_size, c.size), dtype=np.int64)
+        nb_hits = 0
+        with np.errstate(over='ignore', invalid='ignore'):
+            for n in nb_active:
+                zn = z[:n]
+                np.add(zn.real, 2., out=fx[:n])
+                fx[:n] *= scaleX
+                np.add(zn.imag, 2., out=fy[:n])
+                fy[:n] *= scaleY
+                # Le rejeu n'est pas forcément identique bit à bit au comptage (arrondis des boucles vectorisées de
+                # numpy) : une orbite chaotique peut diverger un peu plus tôt et déborder. On ne garde que les points
+                # de l'image (les NaN échouent aux comparaisons).
+                np.less(fx[:n], width, out=mask[:n])
+                mask[:n] &= fx[:n] >= 0.
+                mask[:n] &= fy[:n] < height
+                mask[:n] &= fy[:n] >= 0.
+                ix[:n] = fx[:n]
+                iy[:n] = fy[:n]
+                ix[:n] *= height
+                ix[:n] += iy[:n]
+                # Un point par canal auquel l'orbite contribue, décalé dans l'image du canal
+                for ch in range(member.shape[0]):
+                    np.logical_and(mask[:n], member[ch, :n], out=sel[:n])
+                    nb_valid = np.count_nonzero(sel[:n])
+                    if nb_hits + nb_valid > hits.size:
+                        histogram += np.bincount(hits[:nb_hits], minlength=histogram.size)
+                        nb_hits = 0
+                    np.compress(sel[:n], ix[:n], out=hits[nb_hits:nb_hits+nb_valid])
+                    hits[nb_hits:nb_hits+nb_valid] += ch*stride
+                    nb_hits += nb_valid
+                np.multiply(zn, zn, out=zn)
+                zn += c[:n]
+        histogram += np.bincount(hits[:nb_hits], minlength=histogram.size)
 
-    def convergence(self, c:complex, clamp=True) -> float:
-        value = self.count_iterations(c)[0]/self.max_iterations
-        return max(0.0, min(value, 1.0)) if clamp else value
+# Canaux de l'image : (nombre d'échantillons, itération de divergence minimale, maximale). Un échantillon
+# contribue à un canal s'il fait partie de ses nbSamples premiers échantillons et si son nombre d'itérations
+# avant divergence est dans [minIter, maxIter[. Chaque échantillon n'est itéré qu'une fois, jusqu'au plus
+# grand maxIter, et chaque point de son orbite est ajouté à l'histogramme de chacun des canaux pour lesquels
+# il est qualifié (un histogramme (width, height) par canal).
+def channel_codes(niter : np.ndarray, first : int, channels ) -> np.ndarray:
+    """
+    Code de chaque échantillon (d'indices globaux first, first+1, ...) : l'ensemble des canaux auxquels il
+    contribue codé en binaire (bit ch pour le canal ch, 0 : l'échantillon ne contribue à aucun canal)
+    """
+    index = first + np.arange(niter.size)
+    code  = np.zeros(niter.size, dtype=np.int64)
+    for ch, (nbSamples, minIter, maxIter) in enumerate(channels):
+        code |= ((index < nbSamples) & (niter >= minIter) & (niter < maxIter)).astype(np.int64) << ch
+    return code
 
-    def count_iterations(self, c: complex) :
-        iter : int
-        z = []
-        z.append(c)
-        for iter in range(self.max_iterations):
-            z.append(z[-1]*z[-1] + c)
-            if abs(z[-1]) > self.escape_radius:
-                return iter, np.array(z[:-1],dtype=np.complex128)
-        return self.max_iterations,np.array([],dtype=np.complex128)
-
-# Definition d'une tâche prenant un sous paquet de samples à traiter :
-def bhuddabort_task(nbSamples : int, maxIter : int, width : int, height : int ):
-    radius = 2*np.random.rand(nbSamples)
-    angle  = twoPi*np.random.rand(nbSamples)
-    scaleX = 0.25*width
-    scaleY = 0.25*height
-    image = np.zeros((width, height),dtype=np.int64)
+def half_plane_channels(channels):
+    """
+    Canaux d'un tirage restreint au demi-plan Im(c) >= 0 : l'orbite du conjugué de c est la conjuguée de celle
+    de c, chaque échantillon compte donc pour deux et il en faut deux fois moins par canal
+    """
+    return [((nbSamples+1)//2, minIter, maxIter) for nbSamples, minIter, maxIter in channels]
+
+def mirror(orbits : np.ndarray) -> np.ndarray:
+    """
+    Complète des histogrammes (..., width, height) obtenus dans le demi-plan Im(c) >= 0 par leur symétrique
+    par rapport à l'axe réel
+    """
+    return orbits + orbits[..., ::-1]
+
+# Definition d'une tâche prenant un sous paquet de samples à traiter (les échantillons d'indices first à
+# first+nbSamples-1) : les points des orbites sont accumulés dans histogram, les histogrammes (aplatis bout à
+# bout) persistants des canaux du processus. Les tirages d'un paquet ne dépendent que de la graine et du n° du paquet : un paquet
+# donne le même résultat quel que soit le processus qui le traite, y compris après une reprise.
+def bhuddabort_task(iPack : int, first : int, nbSamples : int, width : int, height : int, channels,
+                    histogram : np.ndarray, symmetric : bool, seed : int ):
+    rng = np.random.default_rng([seed, iPack])
+    radius = 2*rng.random(nbSamples)
+    angle  = (pi if symmetric else twoPi)*rng.random(nbSamples)
     cArr = radius*(np.cos(angle)+np.sin(angle)*1j)
+    # On n'itère que jusqu'au plus grand maxIter des canaux auxquels le paquet peut encore contribuer
+    maxIter = max(ch[2] for ch in channels if ch[0] > first)
     mandelbrot_set = MandelbrotSet(max_iterations=maxIter)
-    for c in cArr:
-        niter, orbit = mandelbrot_set.count_iterations(c)
-        if niter < maxIter:
-            x = np.asarray(scaleX*(orbit.real+2.),dtype=np.int32)
-            y = np.asarray(scaleY*(orbit.imag+2.),dtype=np.int32)
-            mask = np.logical_and(x<width, y<height)
-            xfiltre = x[np.where(mask)]
-            yfiltre = y[np.where(mask)]
-            image[xfiltre,yfiltre] += 1
-    return image
+    niter = mandelbrot_set.count_iterations(cArr)
+    mandelbrot_set.accumulate_orbits(cArr, niter, histogram, width, height, code=channel_codes(niter, first, channels))
+
+# Algorithme maître distribuant les paquets iPack, iPack+1, ... pendant duration secondes (ou jusqu'au dernier
+# paquet), puis signalant la fin de l'époque à chaque esclave. Renvoie le prochain paquet à distribuer.
+# Chaque envoi est une suite de paquets consécutifs (premier paquet, nombre de paquets) :
+#   - sa longueur est adaptée au temps mesuré par l'esclave pour la précédente (visée : targetTime secondes),
+#     et plafonnée en fin de calcul pour que les derniers envois restent courts ;
+#   - chaque esclave a jusqu'à prefetch envois d'avance : il n'attend jamais la réponse du maître ;
+#   - le maître calcule lui-même des paquets, au plus une part masterShare des paquets distribués
+#     (tous s'il est seul).
+def distribute_packs(iPack : int, nbPacks : int, duration : float, comm : MPI.Comm, compute_pack ) -> int:
+    deb = time()
+    nbp = comm.size
+    chunk       = [1]*nbp # Nombre de paquets par envoi pour chaque esclave
+    outstanding = [0]*nbp # Nombre d'envois en attente de réponse pour chaque esclave
+    nbMasterPacks, nbDistributed = 0, 0
+
+    def more_work() -> bool:
+        return iPack < nbPacks and time()-deb < duration
+
+    def dispatch(slaveRk : int):
+        nonlocal iPack, nbDistributed
+        nb = min(chunk[slaveRk], nbPacks-iPack, max(1, (nbPacks-iPack)//(2*nbp)))
+        comm.send((iPack, nb), dest=slaveRk)
+        iPack += nb
+        nbDistributed += nb
+        outstanding[slaveRk] += 1
+
+    for _ in range(prefetch):
+        for slaveRk in range(1,nbp):
+            if more_work():
+                dispatch(slaveRk)
+    stat : MPI.Status = MPI.Status()
+    while more_work() or sum(outstanding) > 0:
+        # On traite d'abord toutes les réponses arrivées pour que les esclaves ne manquent jamais de travail
+        while comm.iprobe(source=MPI.ANY_SOURCE, status=stat):
+            slaveRk = stat.source
+            nb, elapsed = comm.recv(source=slaveRk)
+            outstanding[slaveRk] -= 1
+            # Débit mesuré : nb paquets en elapsed secondes
+            chunk[slaveRk] = max(1, min(maxChunk, round(nb*targetTime/max(elapsed, 1.E-3))))
+            if more_work():
+                dispatch(slaveRk)
+        if more_work() and (nbp == 1 or nbMasterPacks < masterShare*(nbDistributed+nbMasterPacks)):
+            compute_pack(iPack)
+            iPack += 1
+            nbMasterPacks += 1
+        elif sum(outstanding) > 0:
+            comm.probe(source=MPI.ANY_SOURCE, status=stat) # On attend la prochaine réponse
+    for slaveRk in range(1,nbp):
+        comm.send(-1, dest=slaveRk) # -1 : plus de tâche pour cette époque
+    return iPack
+
+# Points de reprise : à la fin de chaque époque, chaque processus écrit l'histogramme de ses canaux dans son
+# fichier, puis le processus 0 met à jour le manifeste (json) qui désigne la génération de fichiers valide.
+# Un fichier n'est pris en compte qu'une fois le manifeste écrit : un arrêt pendant l'écriture d'un point de
+# reprise ramène simplement au précédent.
+def checkpoint_file(directory : str, generation : int, rank : int) -> str:
+    return os.path.join(directory, f"bhudda_{generation:04d}_{rank:03d}.npz")
+
+def save_checkpoint(directory : str, generation : int, orbits : np.ndarray, manifest : dict, comm : MPI.Comm):
+    os.makedirs(directory, exist_ok=True)
+    filename = checkpoint_file(directory, generation, comm.rank)
+    with open(filename + ".tmp", "wb") as f:
+        np.savez(f, orbits=orbits)
+    os.replace(filename + ".tmp", filename)
+    comm.Barrier()
+    if comm.rank == 0:
+        manifest = dict(manifest, generation=generation, nbp=comm.size)
+        manifestName = os.path.join(directory, "manifest.json")
+        with open(manifestName + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifestName + ".tmp", manifestName)
+        # Les fichiers des générations précédentes ne servent plus
+        for oldName in glob.glob(os.path.join(directory, "bhudda_*.npz")):
+            if not os.path.basename(oldName).startswith(f"bhudda_{generation:04d}_"):
+                os.remove(oldName)
+
+def load_checkpoint(directory : str, params : dict, comm : MPI.Comm):
+    """
+    Relit le dernier point de reprise fait avec les mêmes paramètres. Les fichiers des processus de l'exécution
+    précédente sont répartis entre les processus actuels, dont le nombre peut être différent.
+    Renvoie le manifeste et la somme des histogrammes relus par ce processus (None si aucun), ou None.
+    """
+    manifest = None
+    if comm.rank == 0:
+        try:
+            with open(os.path.join(directory, "manifest.json")) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is not None and manifest["params"] != params:
+            manifest = None
+    manifest = comm.bcast(manifest, root=0)
+    if manifest is None:
+        return None
+    restored = None
+    for oldRank in range(comm.rank, manifest["nbp"], comm.size):
+        with np.load(checkpoint_file(directory, manifest["generation"], oldRank)) as data:
+            restored = data["orbits"] if restored is None else restored + data["orbits"]
+    return manifest, restored
+
+# Constitution de l'image à partir des histogrammes des canaux
+def orbits_to_image(orbits : np.ndarray) -> Image.Image:
+    stride : int = orbits.shape[1]*orbits.shape[2]
+    components = []
+    for orbit in orbits:
+        scal : float = 16.*stride/max(np.sum(orbit), 1)
+        components.append(np.array(np.clip((scal*orbit).astype(np.uint8),0,255)))
+    pixels = np.stack(components,axis=-1)
+    return Image.fromarray(pixels, 'RGB')
+
+class HistogramReduction:
+    """
+    Réduction vers le processus 0 d'histogrammes entiers aplatis (int64), en deux niveaux : d'abord entre les
+    processus d'un même nœud vers un chef de nœud, puis entre les chefs de nœud.
+    À chaque niveau, le format échangé est choisi collectivement d'après le taux de remplissage :
+        - creux (moins de sparseFill cases non nulles au total) : les couples (indice, valeur) non nuls sont
+          rassemblés (Gatherv) puis sommés par le récepteur ;
+        - dense sinon : Reduce en uint32, ou en int64 si la somme des maxima locaux risque de déborder.
+    start lance la réduction du niveau nœud (non bloquante), finish la termine et fait le niveau inter-nœuds.
+    """
+    def __init__(self, comm : MPI.Comm, sparseFill : float = 0.25, nodeComm : MPI.Comm = None ):
+        self.comm = comm
+        self.sparseFill = sparseFill
+        self.nodeComm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.rank) if nodeComm is None else nodeComm
+        # Le processus 0 est chef de son nœud et de rang 0 parmi les chefs (clef = rang global)
+        self.leadersComm = comm.Split(0 if self.nodeComm.rank == 0 else MPI.UNDEFINED, key=comm.rank)
+        self.bytesSent = 0
+
+    def _start(self, comm : MPI.Comm, data : np.ndarray):
+        nnz = np.count_nonzero(data)
+        stats = np.array([nnz, data.max(initial=0)], dtype=np.int64)
+        comm.Allreduce(MPI.IN_PLACE, stats, op=MPI.SUM)
+        # stats[1] (somme des maxima locaux) majore toute valeur réduite
+        valueType = np.uint32 if stats[1] < 2**32 else np.int64
+        if stats[0] < self.sparseFill*data.size:
+            index  = np.flatnonzero(data).astype(np.uint32 if data.size < 2**32 else np.int64)
+            values = data[index].astype(valueType)
+            counts = np.array(comm.allgather(nnz))
+            displs = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            allIndex  = np.empty(counts.sum(), dtype=index.dtype) if comm.rank == 0 else None
+            allValues = np.empty(counts.sum(), dtype=valueType) if comm.rank == 0 else None
+            requests = [comm.Igatherv(index, [allIndex, (counts, displs)] if comm.rank == 0 else None, root=0),
+                        comm.Igatherv(values, [allValues, (counts, displs)] if comm.rank == 0 else None, root=0)]
+            self.bytesSent += index.nbytes + values.nbytes
+            return "creux", requests, (index, values, allIndex, allValues, data.size)
+        send = data.astype(valueType)
+        recv = np.empty_like(send) if comm.rank == 0 else None
+        self.bytesSent += send.nbytes
+        return f"dense {send.dtype}", [comm.Ireduce(send, recv, op=MPI.SUM, root=0)], (send, recv)
+
+    def _finish(self, comm : MPI.Comm, handle) -> np.ndarray:
+        kind, requests, buffers = handle
+        MPI.Request.Waitall(requests)
+        if comm.rank != 0:
+            return None
+        if kind == "creux":
+            index, values, allIndex, allValues, size = buffers
+            return np.bincount(allIndex, weights=allValues, minlength=size).astype(np.int64)
+        return buffers[1].astype(np.int64)
+
+    def start(self, data : np.ndarray):
+        return self._start(self.nodeComm, data)
+
+    def finish(self, handle) -> np.ndarray:
+        """
+        Termine la réduction : renvoie l'histogramme total sur le processus 0, None ailleurs
+        """
+        result = self._finish(self.nodeComm, handle)
+        if self.leadersComm != MPI.COMM_NULL and self.leadersComm.size > 1:
+            result = self._finish(self.leadersComm, self._start(self.leadersComm, result))
+        return result if self.comm.rank == 0 else None
 
 # Bhuddabrot to test the chronometer
-def bhuddabrot ( nbSamples : int, maxIter : int, width : int, height : int, comm : MPI.Comm ):
-    packSize = 64
+def bhuddabrot ( channels, width : int, height : int, comm : MPI.Comm, symmetric : bool = True, seed : int = None ):
+    packSize = 1024
     nbp      = comm.size
     rank     = comm.rank
 
+    # symmetric : on ne tire que le demi-plan Im(c) >= 0 et le maître complète l'image par symétrie
+    if symmetric:
+        channels = half_plane_channels(channels)
+    nbSamples = max(ch[0] for ch in channels)
     nbPacks = (nbSamples+packSize-1)//packSize
-    image     = np.zeros((width, height),dtype=np.int64)
-    image_loc = np.zeros((width, height),dtype=np.int64)
-    # Algorithme maître-escalve :
-    if rank==0: # Algorithme maître distribuant les tâches
-
-        iPack : int = 0
-        for iProc in range(1,nbp):
-            comm.send(iPack, iProc)
-            iPack += 1
-        stat : MPI.Status = MPI.Status()
-        while iPack < nbPacks:
-            done = comm.recv(status=stat)# On reçoit du premier process à envoyer un message
-            slaveRk = stat.source
-            comm.send(iPack, dest=slaveRk)
-            iPack += 1
-        iPack = -1 # iPack vaut maintenant -1 pour signaler aux autres procs qu'il n'y a plus de tâches à exécuter
-        for iProc in range(1,nbp):
-            status = MPI.Status()
-            done = comm.recv(status=status)# On reçoit du premier process à envoyer un message
-            slaveRk : int = status.source
-            comm.send(iPack, dest=slaveRk)
-        comm.Reduce([image_loc,MPI.INT64_T], [image,MPI.INT64_T], op=MPI.SUM, root=0)
+    histogram = np.zeros(len(channels)*width*height,dtype=np.int64)
+    # Histogrammes des canaux relus d'un point de reprise, ajoutés à ceux calculés par ce processus
+    restored  = np.zeros((len(channels), width*height),dtype=np.int64)
+
+    params = {"channels": [list(ch) for ch in channels], "width": width, "height": height,
+              "symmetric": symmetric, "packSize": packSize}
+    checkpoint = load_checkpoint(checkpointDir, params, comm)
+    if checkpoint is None:
+        iPack, generation = 0, 0
+        seed = comm.bcast(int(time()) if seed is None else seed, root=0)
     else:
-        status : MPI.Status = MPI.Status()
-        iPack : int
-        res   : int = 1
-
-        iPack = comm.recv(source=0) # On reçoit un n° de tâche à effectuer
-        while iPack != -1:          # Tant qu'il y a une tâche à faire
-            image_loc = bhuddabort_task(packSize, maxIter, width, height )
-            req : MPI.Request = comm.isend(res,0)
-            image += image_loc
-            iPack = comm.recv(source=0) # On reçoit un n° de tâche à effectuer
-            req.wait()
-        comm.Reduce([image,MPI.INT64_T], None, op=MPI.SUM, root=0)
-    return image
+        manifest, orbits = checkpoint
+        iPack, generation, seed = manifest["nextPack"], manifest["generation"], manifest["seed"]
+        if orbits is not None:
+            restored += orbits
+        out.write(f"Reprise au paquet {iPack}/{nbPacks} (point de reprise de {manifest['nbp']} processus)\n")
+
+    # Le calcul est découpé en époques d'environ checkpointInterval secondes. À la fin de chaque époque, on écrit un
+    # point de reprise et on lance une réduction non bloquante des canaux : elle progresse pendant l'époque suivante
+    # et donne un aperçu de l'image à la fin de celle-ci. La dernière réduction donne l'image finale.
+    # Chaque canal est réduit séparément, dans le format le plus compact (le bleu est très creux).
+    reducer   = HistogramReduction(comm)
+
+    def compute_pack(iPackTask : int):
+        first = iPackTask*packSize
+        bhuddabort_task(iPackTask, first, min(packSize, nbSamples-first), width, height, channels,
+                        histogram, symmetric, seed )
+
+    reduction = None
+    while reduction is None or iPack < nbPacks:
+        if iPack < nbPacks:
+            if rank==0: # Algorithme maître distribuant les tâches
+                iPack = distribute_packs(iPack, nbPacks, checkpointInterval, comm, compute_pack)
+            else:
+                task = comm.recv(source=0) # On reçoit une suite de paquets à traiter
+                while task != -1:          # Tant qu'il y a une tâche à faire
+                    first, nb = task
+                    debTask = time()
+                    for iPackTask in range(first, first+nb):
+                        compute_pack(iPackTask)
+                    # On rend compte du temps mis ; les envois suivants sont déjà en attente
+                    req : MPI.Request = comm.isend((nb, time()-debTask),0)
+                    task = comm.recv(source=0)
+                    req.wait()
+            iPack = comm.bcast(iPack, root=0)
+            orbits = histogram.reshape((len(channels), -1)) + restored
+            generation += 1
+            save_checkpoint(checkpointDir, generation, orbits,
+                            {"params": params, "nextPack": iPack, "seed": seed}, comm)
+        else:
+            orbits = histogram.reshape((len(channels), -1)) + restored
+        if reduction is not None:
+            image = [reducer.finish(handle) for handle in reduction]
+            if rank==0:
+                preview = np.stack(image).reshape((len(channels), width, height))
+                orbits_to_image(mirror(preview) if symmetric else preview).save(previewName)
+                out.write(f"Aperçu écrit ({iPackPreview}/{nbPacks} paquets)\n")
+        reduction = [reducer.start(orbit) for orbit in orbits]
+        iPackPreview = iPack
+    image = [reducer.finish(handle) for handle in reduction]
+    out.write(f"Réductions : formats {[handle[0] for handle in reduction]}, {reducer.bytesSent} octets envoyés par ce processus\n")
+    if rank==0:
+        image = np.stack(image).reshape((len(channels), width, height))
+        return mirror(image) if symmetric else image
+    return None
 
 globCom = MPI.COMM_WORLD.Dup()
 nbp     = globCom.size
@@ -103,38 +419,35 @@ name    = MPI.Get_processor_name()
 filename = f"Output{rank:03d}.txt"
 out      = open(filename, mode='w')
 
-# On peut changer les paramètres des deux prochaines lignes
+# On peut changer les paramètres des prochaines lignes
 width, height = 1024, 1024
 
-# Calcul de chaque composante de Bhuddabrot
-s1 = 1500_000 #150_000
-s2 =  500_000 # 50_000
-s3 =    30000 # 3_000
+# Points de reprise et aperçus : un calcul interrompu reprend au dernier point de reprise compatible
+# (mêmes canaux et même taille d'image), avec le même nombre de processus ou non.
+# Supprimer le répertoire checkpointDir pour repartir de zéro.
+checkpointDir      = "bhudda_checkpoint"
+checkpointInterval = 300. # Durée (en secondes) d'une époque entre deux points de reprise
+previewName        = "bhudda_preview.jpg"
+
+# Distribution des paquets (de 1024 échantillons) par le maître
+prefetch    = 2    # Nombre d'envois d'avance par esclave
+targetTime  = 1.   # Durée visée (en secondes) du traitement d'un envoi par un esclave
+maxChunk    = 256  # Nombre maximal de paquets par envoi
+masterShare = 0.05 # Part des paquets calculée par le maître (0 : il ne fait que distribuer)
+
+# Canaux rouge, vert et bleu de Bhuddabrot
+channels = [(1500_000, 0,  2_000),  #(150_000, 0,  2_000)
+            ( 500_000, 0, 10_000),  #( 50_000, 0, 10_000)
+            (   30000, 0, 10_000)]  #(  3_000, 0, 10_000)
 deb = time()
-out.write("red\n")
-redOrbit   = bhuddabrot( s1,  2_000, width, height, globCom)
-out.write("green\n")
-greenOrbit = bhuddabrot(  s2, 10_000, width, height, globCom)
-out.write("blue\n")
-blueOrbit  = bhuddabrot(   s3, 10_000, width, height, globCom)
+orbits = bhuddabrot(channels, width, height, globCom)
 fin = time()
 out.write(f"Temps du calcul de l'ensemble de Bhuddabrot : {fin-deb} secondes\n")
 
 if rank==0:
     # Constitution de l'image résultante :
     deb=time()
-    b1 = np.sum(redOrbit)
-    b2 = np.sum(greenOrbit)
-    b3 = np.sum(blueOrbit)
-    stride : int = width*height
-    scal1 : float = 16.*stride/b1
-    scal2 : float = 16.*stride/b2
-    scal3 : float = 16.*stride/b3
-    red   = np.array(np.clip((scal1*redOrbit).astype(np.uint8),0,255))
-    green = np.array(np.clip((scal2*greenOrbit).astype(np.uint8),0,255))
-    blue  = np.array(np.clip((scal3*blueOrbit).astype(np.uint8),0,255))
-    pixels = np.stack((red,green,blue),axis=-1)
-    image = Image.fromarray(pixels, 'RGB')
+    image = orbits_to_image(orbits)
     fin = time()
     out.write(f"Temps de constitution de l'image : {fin-deb} secondes\n")
     image.save("bhudda.jpg")
@@ -8,79 +8,182 @@ import matplotlib.cm
 
 twoPi = 2.*pi
 
+def in_cardioid_or_bulb(c : np.ndarray) -> np.ndarray:
+    """
+    Vrai pour les points de la cardioïde principale ou du bulbe de période 2 (intérieurs à l'ensemble)
+    """
+    x, y2 = c.real, c.imag*c.imag
+    q = (x-0.25)*(x-0.25) + y2
+    return (q*(q + x - 0.25) <= 0.25*y2) | ((x+1.)*(x+1.) + y2 <= 0.0625)
+
 @dataclass
 class MandelbrotSet:
     max_iterations: int
     escape_radius : float = 2.0
 
-    def __contains__(self, c: complex) -> bool:
-        return self.stability(c) == 1
+    def count_iterations(self, c: np.ndarray) -> np.ndarray:
+        """
+        Nombre d'itérations avant divergence de chaque échantillon de c (max_iterations s'il ne diverge pas).
+        Tous les échantillons sont itérés ensemble ; on ne garde à chaque itération que ceux encore bornés.
+        Les échantillons de la cardioïde principale et du bulbe de période 2 ne divergent jamais : ils sont
+        rejetés sans être itérés (ce sont les plus coûteux, itérés jusqu'à max_iterations).
+        """
+        radius2 = self.escape_radius*self.escape_radius
+        niter = np.full(c.size, self.max_iterations, dtype=np.int64)
+        live  = np.flatnonzero(~in_cardioid_or_bulb(c))
+        cl    = c[live]
+        z     = cl.copy()
+        for iter in range(self.max_iterations):
+            np.multiply(z, z, out=z)
+            z += cl
+            has_diverged = z.real*z.real + z.imag*z.imag > radius2
+            if has_diverged.any():
+                niter[live[has_diverged]] = iter
+                keep = ~has_diverged
+                live, cl, z = live[keep], cl[keep], z[keep]
+                if live.size == 0: break
+        return niter
 
-    def convergence(self, c:complex, clamp=True) -> float:
-        value = self.count_iterations(c)[0]/self.max_iterations
-        return max(0.0, min(value, 1.0)) if clamp else value
+    def accumulate_orbits(self, c: np.ndarray, niter: np.ndarray, histogram: np.ndarray, width : int, height : int,
+                          code : np.ndarray = None, buffer_size : int = 1 << 20):
+        """
+        Ajoute à histogram (image (width, height) aplatie) les points des orbites des échantillons de c ayant divergé.
+        Un échantillon divergé après niter itérations a une orbite de niter+1 points (c, c²+c, ...).
+        Si code est donné, histogram contient une image (width, height) aplatie par canal, bout à bout : l'orbite de
+        l'échantillon i est ajoutée à l'image de chaque canal ch dont le bit ch de code[i] est à 1.
+        Les orbites sont itérées ensemble ; les indices des pixels touchés sont rangés dans un tampon préalloué
+        vidé dans l'histogramme (np.bincount) lorsqu'il est plein.
+        """
+        escaped = niter < self.max_iterations
+        if code is not None:
+            escaped &= code > 0
+        # Tri par longueur d'orbite décroissante : au pas k, les orbites encore actives forment un préfixe
+        order   = np.argsort(-niter[escaped], kind='stable')
+        c       = c[escaped][order]
+        lengths = niter[escaped][order] + 1
+        if c.size == 0: return
+        stride  = width*height
+        if code is None:
+            member = np.ones((1, c.size), dtype=bool)
+        else:
+            code   = code[escaped][order]
+            member = np.stack([(code >> ch) & 1 == 1 for ch in range(histogram.size//stride)])
+        nb_active = np.searchsorted(-lengths, -np.arange(lengths[0]), side='left')
+        scaleX = 0.25*width
+        scaleY = 0.25*height
+        z    = c.copy()
+        fx   = np.empty(c.size, dtype=np.double)
+        fy   = np.empty(c.size, dtype=np.double)
+        ix   = np.empty(c.size, dtype=np.int64)
+        iy   = np.empty(c.size, dtype=np.int64)
+        mask = np.empty(c.size, dtype=bool)
+        sel  = np.empty(c.size, dtype=bool)
+        hits = np.empty(max(buffer_size, c.size), dtype=np.int64)
+        nb_hits = 0
+        with np.errstate(over='ignore', invalid='ignore'):
+            for n in nb_active:
+                zn = z[:n]
+                np.add(zn.real, 2., out=fx[:n])
+                fx[:n] *= scaleX
+                np.add(zn.imag, 2., out=fy[:n])
+                fy[:n] *= scaleY
+                # Le rejeu n'est pas forcément identique bit à bit au comptage (arrondis des boucles vectorisées de
+                # numpy) : une orbite chaotique peut diverger un peu plus tôt et déborder. On ne garde que les points
+                # de l'image (les NaN échouent aux comparaisons).
+                np.less(fx[:n], width, out=mask[:n])
+                mask[:n] &= fx[:n] >= 0.
+                mask[:n] &= fy[:n] < height
+                mask[:n] &= fy[:n] >= 0.
+                ix[:n] = fx[:n]
+                iy[:n] = fy[:n]
+                ix[:n] *= height
+                ix[:n] += iy[:n]
+                # Un point par canal auquel l'orbite contribue, décalé dans l'image du canal
+                for ch in range(member.shape[0]):
+                    np.logical_and(mask[:n], member[ch, :n], out=sel[:n])
+                    nb_valid = np.count_nonzero(sel[:n])
+                    if nb_hits + nb_valid > hits.size:
+                        histogram += np.bincount(hits[:nb_hits], minlength=histogram.size)
+                        nb_hits = 0
+                    np.compress(sel[:n], ix[:n], out=hits[nb_hits:nb_hits+nb_valid])
+                    hits[nb_hits:nb_hits+nb_valid] += ch*stride
+                    nb_hits += nb_valid
+                np.multiply(zn, zn, out=zn)
+                zn += c[:n]
+        histogram += np.bincount(hits[:nb_hits], minlength=histogram.size)
 
-    def count_iterations(self, c: complex) :
-        iter : int
-        z = []
-        z.append(c)
-        for iter in range(self.max_iterations):
-            z.append(z[-1]*z[-1] + c)
-            if abs(z[-1]) > self.escape_radius:
-                return iter, np.array(z[:-1],dtype=np.complex128)
-        return self.max_iterations,np.array([],dtype=np.complex128)
+# Canaux de l'image : (nombre d'échantillons, itération de divergence minimale, maximale). Un échantillon
+# contribue à un canal s'il fait partie de ses nbSamples premiers échantillons et si son nombre d'itérations
+# avant divergence est dans [minIter, maxIter[. Chaque échantillon n'est itéré qu'une fois, jusqu'au plus
+# grand maxIter, et chaque point de son orbite est ajouté à l'histogramme de chacun des canaux pour lesquels
+# il est qualifié (un histogramme (width, height) par canal).
+def channel_codes(niter : np.ndarray, first : int, channels ) -> np.ndarray:
+    """
+    Code de chaque échantillon (d'indices globaux first, first+1, ...) : l'ensemble des canaux auxquels il
+    contribue codé en binaire (bit ch pour le canal ch, 0 : l'échantillon ne contribue à aucun canal)
+    """
+    index = first + np.arange(niter.size)
+    code  = np.zeros(niter.size, dtype=np.int64)
+    for ch, (nbSamples, minIter, maxIter) in enumerate(channels):
+        code |= ((index < nbSamples) & (niter >= minIter) & (niter < maxIter)).astype(np.int64) << ch
+    return code
+
+def half_plane_channels(channels):
+    """
+    Canaux d'un tirage restreint au demi-plan Im(c) >= 0 : l'orbite du conjugué de c est la conjuguée de celle
+    de c, chaque échantillon compte donc pour deux et il en faut deux fois moins par canal
+    """
+    return [((nbSamples+1)//2, minIter, maxIter) for nbSamples, minIter, maxIter in channels]
+
+def mirror(orbits : np.ndarray) -> np.ndarray:
+    """
+    Complète des histogrammes (..., width, height) obtenus dans le demi-plan Im(c) >= 0 par leur symétrique
+    par rapport à l'axe réel
+    """
+    return orbits + orbits[..., ::-1]
 
 # Bhuddabrot to test the chronometer
-def bhuddabrot ( nbSamples : int, maxIter : int, width : int, height : int ):
-    radius = 2*np.random.rand(nbSamples)
-    angle  = twoPi*np.random.rand(nbSamples)
-    scaleX = 0.25*width
-    scaleY = 0.25*height
-    image = np.zeros((width, height),dtype=np.int64)
-    cArr = radius*(np.cos(angle)+np.sin(angle)*1j)
-    mandelbrot_set = MandelbrotSet(max_iterations=maxIter)
-    for c in cArr:
-        niter, orbit = mandelbrot_set.count_iterations(c)
-        if niter < maxIter:
-            x = np.asarray(scaleX*(orbit.real+2.),dtype=np.int32)
-            y = np.asarray(scaleY*(orbit.imag+2.),dtype=np.int32)
-            mask = np.logical_and(x<width, y<height)
-            xfiltre = x[np.where(mask)]
-            yfiltre = y[np.where(mask)]
-            image[xfiltre,yfiltre] += 1
-    return image
+def bhuddabrot ( channels, width : int, height : int, batchSize : int = 4096, symmetric : bool = True ):
+    # symmetric : on ne tire que le demi-plan Im(c) >= 0 et on complète l'image par symétrie
+    if symmetric:
+        channels = half_plane_channels(channels)
+    nbSamples = max(ch[0] for ch in channels)
+    histogram = np.zeros(len(channels)*width*height, dtype=np.int64)
+    # Les échantillons sont traités par lots vectorisés de batchSize échantillons
+    for first in range(0, nbSamples, batchSize):
+        nb = min(batchSize, nbSamples-first)
+        # On n'itère que jusqu'au plus grand maxIter des canaux auxquels le lot peut encore contribuer
+        maxIter = max(ch[2] for ch in channels if ch[0] > first)
+        mandelbrot_set = MandelbrotSet(max_iterations=maxIter)
+        radius = 2*np.random.rand(nb)
+        angle  = (pi if symmetric else twoPi)*np.random.rand(nb)
+        cArr = radius*(np.cos(angle)+np.sin(angle)*1j)
+        niter = mandelbrot_set.count_iterations(cArr)
+        mandelbrot_set.accumulate_orbits(cArr, niter, histogram, width, height, code=channel_codes(niter, first, channels))
+    orbits = histogram.reshape((len(channels), width, height))
+    return mirror(orbits) if symmetric else orbits
 
-# On peut changer les paramètres des deux prochaines lignes
+# On peut changer les paramètres des prochaines lignes
 width, height = 1024, 1024
 
-# Calcul de chaque composante de Bhuddabrot
-s1 = 1500_000 #150_000
-s2 =  500_000 # 50_000
-s3 =    30000 # 3_000
+# Canaux rouge, vert et bleu de Bhuddabrot
+channels = [(1500_000, 0,  2_000),  #(150_000, 0,  2_000)
+            ( 500_000, 0, 10_000),  #( 50_000, 0, 10_000)
+            (   30000, 0, 10_000)]  #(  3_000, 0, 10_000)
 deb = time()
-print("red")
-redOrbit   = bhuddabrot( s1,  2_000, width, height)
-print("green")
-greenOrbit = bhuddabrot(  s2, 10_000, width, height)
-print("blue")
-blueOrbit  = bhuddabrot(   s3, 10_000, width, height)
+orbits = bhuddabrot(channels, width, height)
 fin = time()
 print(f"Temps du calcul de l'ensemble de Bhuddabrot : {fin-deb}")
 
 
 # Constitution de l'image résultante :
 deb=time()
-b1 = np.sum(redOrbit)
-b2 = np.sum(greenOrbit)
-b3 = np.sum(blueOrbit)
 stride : int = width*height
-scal1 : float = 16.*stride/b1
-scal2 : float = 16.*stride/b2
-scal3 : float = 16.*stride/b3
-red   = np.array(np.clip((scal1*redOrbit).astype(np.uint8),0,255))
-green = np.array(np.clip((scal2*greenOrbit).astype(np.uint8),0,255))
-blue  = np.array(np.clip((scal3*blueOrbit).astype(np.uint8),0,255))
-pixels = np.stack((red,green,blue),axis=-1)
+components = []
+for orbit in orbits:
+    scal : float = 16.*stride/np.sum(orbit)
+    components.append(np.array(np.clip((scal*orbit).astype(np.uint8),0,255)))
+pixels = np.stack(components,axis=-1)
 image = Image.fromarray(pixels, 'RGB')
 fin = time()
 print(f"Temps de constitution de l'image : {fin-deb}")
@@ -3,8 +3,8 @@ from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
 from mpi4py import MPI
+from palette import palette, colorize, quantize
 
 
 @dataclass
@@ -52,51 +52,60 @@ width, height = 1024, 1024
 scaleX = 3./width
 scaleY = 2.25/height
 
+# Paramètres de l'assemblage de l'image :
+use_shared_memory = True # Fenêtre mémoire partagée MPI-3 si tous les processus sont sur le même nœud
+quantized = False        # Sinon, envoi de la convergence quantifiée en uint16 (4 fois moins d'octets)
+
 lines_per_proc = height // nbp
 remainder = height % nbp
-if rank < remainder:
-    local_height = lines_per_proc + 1
-    start_y = rank * local_height
-else:
-    local_height = lines_per_proc
-    start_y = rank * lines_per_proc + remainder
-
+counts = np.array([lines_per_proc + (1 if p < remainder else 0) for p in range(nbp)])
+starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+local_height = counts[rank]
+start_y = starts[rank]
 end_y = start_y + local_height
 
-local_convergence = np.empty((width, local_height), dtype=np.double)
+# L'image est stockée ligne par ligne (hauteur, largeur) : le bloc de chaque processus y est contigu
+node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED)
+shared = use_shared_memory and node_comm.size == nbp
+if shared:
+    # Le processus 0 alloue l'image finale dans une fenêtre partagée et chacun y calcule directement ses lignes
+    itemsize = MPI.DOUBLE.Get_size()
+    win = MPI.Win.Allocate_shared(width*height*itemsize if rank == 0 else 0, itemsize, comm=node_comm)
+    buf, itemsize = win.Shared_query(0)
+    convergence = np.ndarray(buffer=buf, dtype=np.double, shape=(height, width))
+    local_convergence = convergence[start_y:end_y]
+    win.Fence()
+else:
+    local_convergence = np.empty((local_height, width), dtype=np.double)
 
 deb = time()
 for idx, y in enumerate(range(start_y, end_y)):
     for x in range(width):
         c = complex(-2. + scaleX*x, -1.125 + scaleY * y)
-        local_convergence[x, idx] = mandelbrot_set.convergence(c, smooth=True)
+        local_convergence[idx, x] = mandelbrot_set.convergence(c, smooth=True)
 fin = time()
 
 if rank == 0:
     print(f"Temps du calcul de l'ensemble de Mandelbrot (avec {nbp} processus) : {fin-deb}")
 
+deb = time()
+if shared:
+    win.Fence()
+else:
+    # Rassemblement direct dans l'image finale : les déplacements sont ceux des blocs de lignes
+    sendbuf = quantize(local_convergence) if quantized else local_convergence
+    mpi_type = MPI.UINT16_T if quantized else MPI.DOUBLE
+    convergence = np.empty((height, width), dtype=sendbuf.dtype) if rank == 0 else None
+    comm.Gatherv([sendbuf, mpi_type], [convergence, counts*width, starts*width, mpi_type], root=0)
+fin = time()
+
 if rank == 0:
-    convergence = np.empty((width, height), dtype=np.double)
-    convergence[:, start_y:end_y] = local_convergence
-    
-    for p in range(1, nbp):
-        if p < remainder:
-            p_height = lines_per_proc + 1
-            p_start = p * p_height
-        else:
-            p_height = lines_per_proc
-            p_start = p * lines_per_proc + remainder
-        
-        p_end = p_start + p_height
-        recv_buffer = np.empty((width, p_height), dtype=np.double)
-        comm.Recv(recv_buffer, source=p, tag=0)
-        convergence[:, p_start:p_end] = recv_buffer
-    
+    print(f"Temps d'assemblage de l'image ({'mémoire partagée' if shared else 'Gatherv ' + str(convergence.dtype)}) : {fin-deb}")
     deb = time()
-    image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
+    image = Image.fromarray(colorize(convergence, palette()))
     fin = time()
     print(f"Temps de constitution de l'image : {fin-deb}")
     image.save("mandelbrot_bloc.png")
     print("Image sauvegardée sous 'mandelbrot_bloc.png'")
-else:
-    comm.Send(local_convergence, dest=0, tag=0)
+if shared:
+    win.Free()
@@ -0,0 +1,122 @@
+import numpy as np
+from dataclasses import dataclass
+from PIL import Image
+from math import log
+from time import time
+from mpi4py import MPI
+from palette import palette, colorize
+
+
+@dataclass
+class MandelbrotSet:
+    max_iterations: int
+    escape_radius:  float = 2.0
+
+    def __contains__(self, c: complex) -> bool:
+        return self.stability(c) == 1
+
+    def convergence(self, c: complex, smooth=False, clamp=True) -> float:
+        value = self.count_iterations(c, smooth)/self.max_iterations
+        return max(0.0, min(value, 1.0)) if clamp else value
+
+    def in_known_region(self, c: complex) -> bool:
+        """
+        Vrai si c appartient à une zone de convergence connue (disques C0, C1 ou cardioïde) : pas besoin d'itérer
+        """
+        if c.real*c.real+c.imag*c.imag < 0.0625:
+            return True
+        if (c.real+1)*(c.real+1)+c.imag*c.imag < 0.0625:
+            return True
+        if (c.real > -0.75) and (c.real < 0.5):
+            ct = c.real-0.25 + 1.j * c.imag
+            ctnrm2 = abs(ct)
+            if ctnrm2 < 0.5*(1-ct.real/max(ctnrm2, 1.E-14)):
+                return True
+        return False
+
+    def count_iterations(self, c: complex,  smooth=False) -> int | float:
+        z:    complex
+        iter: int
+
+        if self.in_known_region(c):
+            return self.max_iterations
+        z = 0
+        for iter in range(self.max_iterations):
+            z = z*z + c
+            if abs(z) > self.escape_radius:
+                if smooth:
+                    return iter + 1 - log(log(abs(z)))/log(2)
+                return iter
+        return self.max_iterations
+
+    def cost(self, c: complex, pixel_cost : float) -> float:
+        """
+        Coût estimé du calcul de c, en nombre d'itérations : coût fixe d'un pixel plus itérations effectuées
+        """
+        if self.in_known_region(c):
+            return pixel_cost
+        return pixel_cost + min(self.count_iterations(c) + 1, self.max_iterations)
+
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+nbp = comm.Get_size()
+
+mandelbrot_set = MandelbrotSet(max_iterations=50, escape_radius=10)
+width, height = 1024, 1024
+
+scaleX = 3./width
+scaleY = 2.25/height
+
+preview_step = 4  # Pré-calcul sur une ligne et une colonne sur preview_step (1/16 des pixels pour 4)
+pixel_cost = 16.  # Coût fixe d'un pixel, en itérations (mesuré pour ce noyau scalaire en python)
+
+deb = time()
+# 1. Pré-calcul basse résolution, réparti cyclique entre les processus : le coût d'une ligne est estimé
+#    à partir des itérations effectuées pour ses points (les points de la cardioïde valent max_iterations
+#    mais ne sont pas itérés) plus un coût fixe par pixel
+preview_rows = np.arange(0, height, preview_step)
+preview_cost = np.zeros(preview_rows.size, dtype=np.double)
+for i in range(rank, preview_rows.size, nbp):
+    for x in range(0, width, preview_step):
+        c = complex(-2. + scaleX*x, -1.125 + scaleY * preview_rows[i])
+        preview_cost[i] += mandelbrot_set.cost(c, pixel_cost)
+comm.Allreduce(MPI.IN_PLACE, preview_cost, op=MPI.SUM)
+
+# 2. Coût estimé de chaque ligne (interpolation entre les lignes du pré-calcul), puis découpage en nbp blocs
+#    de lignes contiguës de même coût cumulé
+row_cost = np.interp(np.arange(height), preview_rows, preview_cost)
+cumulative_cost = np.cumsum(row_cost)
+cuts = np.searchsorted(cumulative_cost, cumulative_cost[-1]*np.arange(1, nbp)/nbp)
+starts = np.concatenate(([0], cuts))
+counts = np.diff(np.concatenate((starts, [height])))
+start_y = starts[rank]
+end_y = start_y + counts[rank]
+fin_preview = time()
+
+# 3. Calcul de son bloc par chaque processus
+local_convergence = np.empty((counts[rank], width), dtype=np.double)
+for idx, y in enumerate(range(start_y, end_y)):
+    for x in range(width):
+        c = complex(-2. + scaleX*x, -1.125 + scaleY * y)
+        local_convergence[idx, x] = mandelbrot_set.convergence(c, smooth=True)
+fin = time()
+
+local_times = comm.gather(fin-fin_preview, root=0)
+if rank == 0:
+    print(f"Temps du calcul de l'ensemble de Mandelbrot (avec {nbp} processus, découpage par coût) : {fin-deb}")
+    print(f"Temps du pré-calcul : {fin_preview-deb}")
+    print(f"Lignes par processus : {counts.tolist()}")
+    print(f"Temps de calcul par processus : {[round(t, 3) for t in local_times]}")
+
+# 4. Rassemblement direct dans l'image finale (hauteur, largeur)
+convergence = np.empty((height, width), dtype=np.double) if rank == 0 else None
+comm.Gatherv(local_convergence, [convergence, counts*width, starts*width, MPI.DOUBLE], root=0)
+
+if rank == 0:
+    deb = time()
+    image = Image.fromarray(colorize(convergence, palette()))
+    fin = time()
+    print(f"Temps de constitution de l'image : {fin-deb}")
+    image.save("mandelbrot_cout.png")
+    print("Image sauvegardée sous 'mandelbrot_cout.png'")
@@ -0,0 +1,168 @@
+# Rendu de très grandes images de l'ensemble de Mandelbrot avec une mémoire bornée par processus
+#
+# Aucun processus ne stocke l'image complète : l'image est découpée en bandes de lignes, chaque processus
+# calcule une bande, la colorise et l'écrit directement à sa place dans le fichier image (MPI-IO), puis passe
+# à la bande suivante. Le fichier est au format PPM binaire (P6) : un court en-tête texte suivi des pixels
+# RGB bruts ligne par ligne, ce qui permet d'écrire chaque bande à un offset connu à l'avance.
+# Les bandes sont distribuées dynamiquement par un compteur partagé (fenêtre RMA, Fetch_and_op) :
+# il n'y a pas de maître, tous les processus calculent.
+import numpy as np
+from math import log
+from time import time
+from mpi4py import MPI
+import sys
+from palette import palette, colorize
+
+
+class MandelbrotSet:
+
+    def __init__(self, max_iterations : int, escape_radius : float = 2., periodicity_tolerance : float = 1.E-10 ):
+        self.max_iterations = max_iterations
+        self.escape_radius  = escape_radius
+        self.periodicity_tolerance2 = periodicity_tolerance*periodicity_tolerance
+
+    def convergence(self, c: np.ndarray, smooth=False, clamp=True) -> np.ndarray:
+        value = self.count_iterations(c, smooth)/self.max_iterations
+        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
+
+    def count_iterations(self, c: np.ndarray,  smooth=False) -> np.ndarray:
+        iter: np.ndarray
+
+        c = np.asarray(c, dtype=np.complex128)
+        iter = np.full(c.size, self.max_iterations, dtype=np.double)
+        # On vérifie dans un premier temps si le complexe
+        # n'appartient pas à une zone de convergence connue :
+        #   1. Appartenance au disque C1{(-1,0),1/4} (bulbe de période 2)
+        #   2. Appartenance à la cardioïde {(1/4,0),1/2(1-cos(theta))} (qui contient le disque C0{(0,0),1/4})
+        ct = c - 0.25
+        ctnrm2 = ct.real*ct.real + ct.imag*ct.imag
+        interior = ctnrm2*(ctnrm2 + ct.real) <= 0.25*c.imag*c.imag
+        interior |= (c.real+1.)*(c.real+1.) + c.imag*c.imag <= 0.0625
+        live = np.flatnonzero(~interior)
+        # Sinon on itère, uniquement sur les points encore vivants : on garde un ensemble compacté de ces
+        # points (indices, c et z en parties réelle et imaginaire séparées) qui rétrécit au fil des itérations.
+        # Deux jeux de tampons préalloués : la compaction se fait de l'un vers l'autre, sans allocation.
+        # On détecte de plus les orbites périodiques (méthode de Brent) : z est sauvegardé aux itérations
+        # 2^k-1 et un point dont l'orbite repasse par la valeur sauvegardée est intérieur à l'ensemble.
+        n = live.size
+        state = np.zeros((2, 6, n), dtype=np.double) # (cr, ci, zr, zi, zr sauvegardé, zi sauvegardé)
+        indices = np.empty((2, n), dtype=np.intp)
+        work = np.empty((4, n), dtype=np.double)     # (zr², zi², |z|², distance² à z sauvegardé)
+        has_diverged = np.empty(n, dtype=bool)
+        is_periodic = np.empty(n, dtype=bool)
+        modulus2 = np.empty(c.size, dtype=np.double) if smooth else None
+        state[0, 0] = c.real.ravel()[live]
+        state[0, 1] = c.imag.ravel()[live]
+        indices[0] = live
+        radius2 = self.escape_radius*self.escape_radius
+        cur = 0
+        for it in range(self.max_iterations):
+            if n == 0: break
+            cr, ci, zr, zi, zrs, zis = state[cur, :, :n]
+            zr2, zi2, mod2, dist2 = work[:, :n]
+            diverged = has_diverged[:n]
+            periodic = is_periodic[:n]
+            # z = z*z + c
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            zi *= zr
+            zi *= 2.
+            zi += ci
+            np.subtract(zr2, zi2, out=zr)
+            zr += cr
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            np.add(zr2, zi2, out=mod2)
+            np.greater(mod2, radius2, out=diverged)
+            nb_diverged = np.count_nonzero(diverged)
+            np.subtract(zr, zrs, out=dist2)
+            np.multiply(dist2, dist2, out=dist2)
+            np.subtract(zi, zis, out=zi2)
+            np.multiply(zi2, zi2, out=zi2)
+            dist2 += zi2
+            np.less(dist2, self.periodicity_tolerance2, out=periodic)
+            nb_periodic = np.count_nonzero(periodic)
+            if it & (it+1) == 0:
+                zrs[:] = zr
+                zis[:] = zi
+            if nb_diverged + nb_periodic > 0:
+                if nb_diverged > 0:
+                    escaped = indices[cur, :n][diverged]
+                    iter[escaped] = it
+                    if smooth:
+                        modulus2[escaped] = mod2[diverged]
+                np.logical_or(diverged, periodic, out=diverged)
+                np.logical_not(diverged, out=diverged)
+                m = np.count_nonzero(diverged)
+                np.compress(diverged, state[cur, :, :n], axis=1, out=state[1-cur, :, :m])
+                np.compress(diverged, indices[cur, :n], out=indices[1-cur, :m])
+                cur = 1 - cur
+                n = m
+        if smooth:
+            has_diverged = iter < self.max_iterations
+            iter[has_diverged] += 1 - np.log(0.5*np.log(modulus2[has_diverged]))/log(2)
+        return iter.reshape(c.shape)
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+nbp = comm.Get_size()
+
+# On peut changer les paramètres des prochaines lignes (dimensions aussi en ligne de commande)
+mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
+width, height = 8192, 8192
+if len(sys.argv) > 2:
+    width, height = int(sys.argv[1]), int(sys.argv[2])
+strip_pixels = 1 << 18 # Nombre de pixels par bande : borne la mémoire utilisée par chaque processus
+filename = "mandelbrot_gigapixel.ppm"
+
+scaleX = 3./width
+scaleY = 2.25/height
+strip_height = max(1, strip_pixels//width)
+nb_strips = (height + strip_height - 1)//strip_height
+
+header = f"P6\n{width} {height}\n255\n".encode("ascii")
+fh = MPI.File.Open(comm, filename, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+fh.Set_size(len(header) + 3*width*height)
+if rank == 0:
+    fh.Write_at(0, np.frombuffer(header, dtype=np.uint8))
+
+# Compteur partagé donnant la prochaine bande à calculer, hébergé par le processus 0
+int64_size = MPI.INT64_T.Get_size()
+counter = MPI.Win.Allocate(int64_size if rank == 0 else 0, int64_size, comm=comm)
+if rank == 0:
+    np.frombuffer(counter.tomemory(), dtype=np.int64)[0] = 0
+comm.Barrier()
+one = np.ones(1, dtype=np.int64)
+strip = np.empty(1, dtype=np.int64)
+
+def next_strip() -> int:
+    counter.Lock(0, MPI.LOCK_SHARED)
+    counter.Fetch_and_op(one, strip, 0, op=MPI.SUM)
+    counter.Unlock(0)
+    return strip[0]
+
+lut = palette()
+x = -2. + scaleX*np.arange(width)
+nb_local_strips = 0
+deb = time()
+s = next_strip()
+while s < nb_strips:
+    y0 = s*strip_height
+    y1 = min(height, y0 + strip_height)
+    y = -1.125 + scaleY*np.arange(y0, y1)
+    c = x[np.newaxis, :] + 1.j*y[:, np.newaxis]
+    pixels = colorize(mandelbrot_set.convergence(c, smooth=True), lut)
+    fh.Write_at(len(header) + 3*width*y0, pixels)
+    nb_local_strips += 1
+    s = next_strip()
+fin = time()
+
+fh.Close()
+counter.Free()
+nb_strips_per_proc = comm.gather(nb_local_strips, root=0)
+total = comm.reduce(fin-deb, op=MPI.MAX, root=0)
+if rank == 0:
+    print(f"Temps du calcul de l'ensemble de Mandelbrot ({width}x{height}, {nbp} processus, "
+          f"{nb_strips} bandes de {strip_height} lignes) : {total}")
+    print(f"Bandes calculées par processus : {nb_strips_per_proc}")
+    print(f"Image sauvegardée sous '{filename}'")
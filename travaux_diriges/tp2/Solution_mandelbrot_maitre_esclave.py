@@ -3,8 +3,8 @@ from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
 from mpi4py import MPI
+from palette import palette, colorize
 
 
 @dataclass
@@ -59,7 +59,7 @@ TAG_STOP = 3
 deb_total = time()
 
 if rank == 0:
-    convergence = np.empty((width, height), dtype=np.double)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
     next_line = 0
     finished_workers = 0
     
@@ -78,7 +78,7 @@ if rank == 0:
         
         y_line = result['line']
         line_data = result['data']
-        convergence[:, y_line] = line_data
+        pixels[y_line] = line_data
         
         if next_line < height:
             comm.send(next_line, dest=worker, tag=TAG_WORK)
@@ -91,13 +91,14 @@ if rank == 0:
     print(f"Temps du calcul de l'ensemble de Mandelbrot (maître-esclave avec {nbp} processus) : {fin_total-deb_total}")
     
     deb = time()
-    image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
+    image = Image.fromarray(pixels)
     fin = time()
     print(f"Temps de constitution de l'image : {fin-deb}")
     image.save("mandelbrot_maitre_esclave.png")
     print("Image sauvegardée sous 'mandelbrot_maitre_esclave.png'")
 
 else:
+    lut = palette()
     while True:
         y_line = comm.recv(source=0, tag=MPI.ANY_TAG, status=MPI.Status())
         
@@ -109,5 +110,6 @@ else:
             c = complex(-2. + scaleX*x, -1.125 + scaleY * y_line)
             line_data[x] = mandelbrot_set.convergence(c, smooth=True)
         
-        result = {'line': y_line, 'data': line_data}
+        # La ligne est colorisée par l'esclave : 3 octets par pixel au lieu de 8
+        result = {'line': y_line, 'data': colorize(line_data, lut)}
         comm.send(result, dest=0, tag=TAG_RESULT)
@@ -3,8 +3,8 @@ from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
 from mpi4py import MPI
+from palette import palette, colorize, quantize
 
 
 @dataclass
@@ -52,44 +52,64 @@ width, height = 1024, 1024
 scaleX = 3./width
 scaleY = 2.25/height
 
-local_lines = []
-for y in range(height):
-    if y % nbp == rank:
-        local_lines.append(y)
+# Paramètres de l'assemblage de l'image :
+use_shared_memory = True # Fenêtre mémoire partagée MPI-3 si tous les processus sont sur le même nœud
+quantized = False        # Sinon, envoi de la convergence quantifiée en uint16 (4 fois moins d'octets)
 
-local_height = len(local_lines)
-local_convergence = np.empty((width, local_height), dtype=np.double)
+counts = np.array([len(range(p, height, nbp)) for p in range(nbp)])
+local_height = counts[rank]
+
+# L'image est stockée ligne par ligne (hauteur, largeur) : les lignes d'un processus y sont espacées de nbp lignes
+node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED)
+shared = use_shared_memory and node_comm.size == nbp
+if shared:
+    # Le processus 0 alloue l'image finale dans une fenêtre partagée et chacun y calcule directement ses lignes
+    itemsize = MPI.DOUBLE.Get_size()
+    win = MPI.Win.Allocate_shared(width*height*itemsize if rank == 0 else 0, itemsize, comm=node_comm)
+    buf, itemsize = win.Shared_query(0)
+    convergence = np.ndarray(buffer=buf, dtype=np.double, shape=(height, width))
+    local_convergence = convergence[rank::nbp]
+    win.Fence()
+else:
+    local_convergence = np.empty((local_height, width), dtype=np.double)
 
 deb = time()
-for idx, y in enumerate(local_lines):
+for idx, y in enumerate(range(rank, height, nbp)):
     for x in range(width):
         c = complex(-2. + scaleX*x, -1.125 + scaleY * y)
-        local_convergence[x, idx] = mandelbrot_set.convergence(c, smooth=True)
+        local_convergence[idx, x] = mandelbrot_set.convergence(c, smooth=True)
 fin = time()
 
 if rank == 0:
     print(f"Temps du calcul de l'ensemble de Mandelbrot (avec {nbp} processus, interleaving) : {fin-deb}")
 
+deb = time()
+if shared:
+    win.Fence()
+else:
+    sendbuf = quantize(local_convergence) if quantized else local_convergence
+    mpi_type = MPI.UINT16_T if quantized else MPI.DOUBLE
+    if rank == 0:
+        # Réception directe dans l'image finale : les lignes du processus p sont décrites par un type dérivé
+        # (counts[p] lignes de width valeurs, espacées de nbp lignes) à partir de la ligne p
+        convergence = np.empty((height, width), dtype=sendbuf.dtype)
+        convergence[0::nbp] = sendbuf
+        lines_types = [mpi_type.Create_vector(counts[p], width, nbp*width).Commit() for p in range(1, nbp)]
+        requests = [comm.Irecv([convergence[p:], 1, lines_types[p-1]], source=p, tag=0) for p in range(1, nbp)]
+        MPI.Request.Waitall(requests)
+        for lines_type in lines_types:
+            lines_type.Free()
+    else:
+        comm.Send([sendbuf, mpi_type], dest=0, tag=0)
+fin = time()
+
 if rank == 0:
-    convergence = np.empty((width, height), dtype=np.double)
-    for idx, y in enumerate(local_lines):
-        convergence[:, y] = local_convergence[:, idx]
-    
-    for p in range(1, nbp):
-        p_lines = [y for y in range(height) if y % nbp == p]
-        p_height = len(p_lines)
-        
-        recv_buffer = np.empty((width, p_height), dtype=np.double)
-        comm.Recv(recv_buffer, source=p, tag=0)
-        
-        for idx, y in enumerate(p_lines):
-            convergence[:, y] = recv_buffer[:, idx]
-    
+    print(f"Temps d'assemblage de l'image ({'mémoire partagée' if shared else 'Irecv ' + str(convergence.dtype)}) : {fin-deb}")
     deb = time()
-    image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
+    image = Image.fromarray(colorize(convergence, palette()))
     fin = time()
     print(f"Temps de constitution de l'image : {fin-deb}")
     image.save("mandelbrot_statique.png")
     print("Image sauvegardée sous 'mandelbrot_statique.png'")
-else:
-    comm.Send(local_convergence, dest=0, tag=0)
+if shared:
+    win.Free()
@@ -0,0 +1,199 @@
+import numpy as np
+from PIL import Image
+from math import log
+from time import time
+from collections import deque
+from mpi4py import MPI
+from palette import palette, colorize
+
+
+class MandelbrotSet:
+
+    def __init__(self, max_iterations : int, escape_radius : float = 2. ):
+        self.max_iterations = max_iterations
+        self.escape_radius  = escape_radius
+
+    def convergence(self, c: np.ndarray, smooth=False, clamp=True) -> np.ndarray:
+        value = self.count_iterations(c, smooth)/self.max_iterations
+        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
+
+    def count_iterations(self, c: np.ndarray, smooth=False) -> np.ndarray:
+        iter = np.full(c.shape, self.max_iterations, dtype=np.double)
+        # Points appartenant aux disques C0{(0,0),1/4}, C1{(-1,0),1/4} ou à la cardioïde : on n'itère pas
+        ct = c - 0.25
+        ctnrm = np.abs(ct)
+        mask = (np.abs(c) >= 0.25) & (np.abs(c+1.) >= 0.25)
+        mask &= ctnrm >= 0.5*(1-ct.real/np.maximum(ctnrm, 1.E-14))
+        z = np.zeros(c.shape, dtype=np.complex128)
+        for it in range(self.max_iterations):
+            z[mask] = z[mask]*z[mask] + c[mask]
+            has_diverged = mask & (np.abs(z) > self.escape_radius)
+            iter[has_diverged] = it
+            mask &= ~has_diverged
+            if not mask.any(): break
+        if smooth:
+            has_diverged = iter < self.max_iterations
+            iter[has_diverged] += 1 - np.log(np.log(np.abs(z[has_diverged])))/log(2)
+        return iter
+
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+nbp = comm.Get_size()
+
+mandelbrot_set = MandelbrotSet(max_iterations=50, escape_radius=10)
+width, height = 1024, 1024
+
+scaleX = 3./width
+scaleY = 2.25/height
+
+# Paramètres de l'ordonnanceur :
+tile_size      = 64    # Taille initiale (en pixels) des tuiles
+min_tile_size  = 16    # Taille en dessous de laquelle on ne découpe plus une tuile
+tiles_per_proc = 16    # Nombre visé de tuiles "de coût moyen" par processus
+prefetch       = 3     # Nombre de tuiles en vol par esclave (double tampon et plus)
+master_computes = True # Le processus 0 calcule aussi des tuiles entre deux distributions
+
+TAG_WORK = 1
+TAG_RESULT = 2
+
+
+def compute_tile(tile) -> np.ndarray:
+    x0, y0, w, h = tile
+    x = -2. + scaleX*np.arange(x0, x0+w)
+    y = -1.125 + scaleY*np.arange(y0, y0+h)
+    c = x[:, np.newaxis] + 1.j*y[np.newaxis, :]
+    return mandelbrot_set.convergence(c, smooth=True)
+
+
+def render_tile(tile) -> np.ndarray:
+    """
+    Calcule une tuile et la colorise directement : renvoie un tableau RGB (hauteur, largeur, 3) en uint8
+    """
+    return colorize(compute_tile(tile).T, lut)
+
+
+def estimate_cost(tile, samples : int = 4) -> float:
+    """
+    Estime le coût d'une tuile à partir de samples x samples points échantillonnés en son sein
+    (nombre moyen d'itérations + 1 pour le coût fixe de chaque pixel, multiplié par la surface)
+    """
+    x0, y0, w, h = tile
+    x = -2. + scaleX*(x0 + (np.arange(samples)+0.5)*w/samples)
+    y = -1.125 + scaleY*(y0 + (np.arange(samples)+0.5)*h/samples)
+    c = x[:, np.newaxis] + 1.j*y[np.newaxis, :]
+    return (1. + mandelbrot_set.count_iterations(c).mean())*w*h
+
+
+def build_tiles() -> np.ndarray:
+    """
+    Découpe l'image en tuiles rectangulaires : une tuile dont le coût estimé dépasse le coût cible
+    est découpée en quatre, tant qu'elle reste plus grande que min_tile_size.
+    Les tuiles sont renvoyées triées par coût décroissant (les plus coûteuses sont distribuées en premier).
+    """
+    tiles = [(x0, y0, min(tile_size, width-x0), min(tile_size, height-y0))
+             for y0 in range(0, height, tile_size) for x0 in range(0, width, tile_size)]
+    costs = [estimate_cost(t) for t in tiles]
+    target = sum(costs)/(nbp*tiles_per_proc)
+    result = []
+    while len(tiles) > 0:
+        t, cost = tiles.pop(), costs.pop()
+        x0, y0, w, h = t
+        if cost <= target or min(w, h) < 2*min_tile_size:
+            result.append((cost, t))
+            continue
+        w2, h2 = w//2, h//2
+        for sub in ((x0, y0, w2, h2), (x0+w2, y0, w-w2, h2), (x0, y0+h2, w2, h-h2), (x0+w2, y0+h2, w-w2, h-h2)):
+            tiles.append(sub)
+            costs.append(estimate_cost(sub))
+    result.sort(key=lambda ct: -ct[0])
+    return np.array([t for _, t in result], dtype=np.int64)
+
+
+deb_total = time()
+
+# Le maître construit la liste des tuiles et la diffuse à tous (une tuile est ensuite désignée par son indice)
+tiles = build_tiles() if rank == 0 else None
+nb_tiles = comm.bcast(None if tiles is None else tiles.shape[0], root=0)
+if rank != 0:
+    tiles = np.empty((nb_tiles, 4), dtype=np.int64)
+comm.Bcast(tiles, root=0)
+lut = palette()
+
+if rank == 0:
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    # Pour chaque esclave, indices des tuiles envoyées dont on attend le résultat. Les messages entre deux
+    # processus ne se doublent pas : les résultats d'un esclave arrivent dans l'ordre des envois.
+    pending = [deque() for _ in range(nbp)]
+    next_tile = 0          # Prochaine tuile à distribuer (les plus coûteuses en premier)
+    last_tile = nb_tiles-1 # Prochaine tuile calculée par le maître (les moins coûteuses)
+    nb_pending = 0
+    nb_master_tiles = 0
+    stop = np.array([-1], dtype=np.int64)
+
+    def dispatch(worker):
+        global next_tile, nb_pending
+        if next_tile <= last_tile:
+            comm.Send(np.array([next_tile], dtype=np.int64), dest=worker, tag=TAG_WORK)
+            pending[worker].append(next_tile)
+            next_tile += 1
+            nb_pending += 1
+        else:
+            comm.Send(stop, dest=worker, tag=TAG_WORK)
+
+    def receive(status):
+        global nb_pending
+        worker = status.Get_source()
+        x0, y0, w, h = tiles[pending[worker].popleft()]
+        tile_pixels = np.empty((h, w, 3), dtype=np.uint8)
+        comm.Recv(tile_pixels, source=worker, tag=TAG_RESULT)
+        pixels[y0:y0+h, x0:x0+w] = tile_pixels
+        nb_pending -= 1
+        if len(pending[worker]) == 0 or next_tile <= last_tile:
+            # Soit on garde le tampon de l'esclave plein, soit on lui signale la fin (une seule fois)
+            dispatch(worker)
+
+    for _ in range(prefetch):
+        for worker in range(1, nbp):
+            if next_tile <= last_tile:
+                dispatch(worker)
+    for worker in range(1, nbp):
+        if len(pending[worker]) == 0:
+            dispatch(worker)
+
+    status = MPI.Status()
+    while nb_pending > 0 or next_tile <= last_tile:
+        # On sert d'abord tous les résultats arrivés pour que les esclaves ne manquent jamais de travail
+        while comm.Iprobe(source=MPI.ANY_SOURCE, tag=TAG_RESULT, status=status):
+            receive(status)
+        if next_tile <= last_tile and (master_computes or nbp == 1):
+            x0, y0, w, h = tiles[last_tile]
+            last_tile -= 1
+            pixels[y0:y0+h, x0:x0+w] = render_tile((x0, y0, w, h))
+            nb_master_tiles += 1
+        elif nb_pending > 0:
+            comm.Probe(source=MPI.ANY_SOURCE, tag=TAG_RESULT, status=status)
+            receive(status)
+
+    fin_total = time()
+    print(f"Temps du calcul de l'ensemble de Mandelbrot (tuiles, {nbp} processus, {nb_tiles} tuiles dont {nb_master_tiles} calculées par le maître) : {fin_total-deb_total}")
+
+    deb = time()
+    image = Image.fromarray(pixels)
+    fin = time()
+    print(f"Temps de constitution de l'image : {fin-deb}")
+    image.save("mandelbrot_tuiles.png")
+    print("Image sauvegardée sous 'mandelbrot_tuiles.png'")
+
+else:
+    assignment = np.empty(1, dtype=np.int64)
+    requests = []
+    while True:
+        comm.Recv(assignment, source=0, tag=TAG_WORK)
+        if assignment[0] == -1:
+            break
+        tile_data = render_tile(tiles[assignment[0]])
+        # Envoi non bloquant : on enchaîne sur la tuile suivante (déjà en attente) pendant le transfert
+        requests = [(req, buf) for req, buf in requests if not req.Test()]
+        requests.append((comm.Isend(tile_data, dest=0, tag=TAG_RESULT), tile_data))
+    MPI.Request.Waitall([req for req, _ in requests])
@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
+from palette import palette, colorize
 
 
 @dataclass
@@ -65,7 +65,7 @@ print(f"Temps du calcul de l'ensemble de Mandelbrot : {fin-deb}")
 
 # Constitution de l'image résultante :
 deb = time()
-image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
+image = Image.fromarray(colorize(convergence.T, palette()))
 fin = time()
 print(f"Temps de constitution de l'image : {fin-deb}")
 image.show()
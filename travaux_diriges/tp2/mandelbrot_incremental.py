@@ -0,0 +1,204 @@
+# Calcul incrémental de l'ensemble de Mandelbrot : augmentation progressive du nombre maximal d'itérations
+#
+# Plutôt que de tout recalculer depuis z=0 quand on augmente max_iterations, on conserve pour chaque pixel
+# l'état de son itération (z, nombre d'itérations, divergé ou intérieur). Un nouveau calcul avec un budget
+# plus grand ne reprend que les pixels encore bornés, là où ils s'étaient arrêtés.
+# L'état est gardé en mémoire entre deux budgets et sauvegardé sur disque pour une prochaine exécution.
+#
+# Exemple : python mandelbrot_incremental.py 50 100 200
+#           python mandelbrot_incremental.py 1000         (reprend l'état sauvegardé à 200 itérations)
+import numpy as np
+from dataclasses import dataclass
+from PIL import Image
+from math import log
+from time import time
+import os
+import sys
+from palette import palette, colorize
+
+
+@dataclass
+class IterationState:
+    """
+    État de l'itération de chaque pixel d'une vue :
+        - zr, zi        : valeur courante de z pour les pixels encore bornés
+        - iterations    : nombre d'itérations effectuées (itération de divergence pour les pixels divergés)
+        - escaped       : le pixel a divergé
+        - interior      : le pixel est connu comme intérieur à l'ensemble (cardioïde, bulbe, orbite périodique)
+        - modulus2      : |z|² au moment de la divergence (pour le lissage)
+        - max_iterations: budget d'itérations déjà atteint par les pixels encore bornés
+    """
+    zr: np.ndarray
+    zi: np.ndarray
+    iterations: np.ndarray
+    escaped: np.ndarray
+    interior: np.ndarray
+    modulus2: np.ndarray
+    max_iterations: int = 0
+
+    @classmethod
+    def new(cls, shape):
+        return cls(np.zeros(shape), np.zeros(shape), np.zeros(shape, dtype=np.int32),
+                   np.zeros(shape, dtype=bool), np.zeros(shape, dtype=bool), np.zeros(shape))
+
+    def save(self, filename : str, viewport : np.ndarray):
+        np.savez(filename, zr=self.zr, zi=self.zi, iterations=self.iterations, escaped=self.escaped,
+                 interior=self.interior, modulus2=self.modulus2, max_iterations=self.max_iterations,
+                 viewport=viewport)
+
+    @classmethod
+    def load(cls, filename : str, viewport : np.ndarray):
+        """
+        Relit un état sauvegardé, ou renvoie None s'il n'existe pas ou correspond à une autre vue
+        """
+        if not os.path.exists(filename):
+            return None
+        with np.load(filename) as data:
+            if not np.array_equal(data["viewport"], viewport):
+                return None
+            return cls(data["zr"], data["zi"], data["iterations"], data["escaped"], data["interior"],
+                       data["modulus2"], int(data["max_iterations"]))
+
+
+class MandelbrotSet:
+
+    def __init__(self, max_iterations : int, escape_radius : float = 2., periodicity_tolerance : float = 1.E-10 ):
+        self.max_iterations = max_iterations
+        self.escape_radius  = escape_radius
+        self.periodicity_tolerance2 = periodicity_tolerance*periodicity_tolerance
+
+    def convergence(self, c: np.ndarray, state: IterationState, smooth=False, clamp=True) -> np.ndarray:
+        value = self.count_iterations(c, state, smooth)/self.max_iterations
+        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
+
+    def count_iterations(self, c: np.ndarray, state: IterationState, smooth=False) -> np.ndarray:
+        """
+        Amène state jusqu'à max_iterations (si besoin) et renvoie le nombre d'itérations de chaque pixel
+        """
+        if state.max_iterations == 0:
+            # Premier calcul : cardioïde et bulbe de période 2 n'ont pas besoin d'être itérés
+            ct = c - 0.25
+            ctnrm2 = ct.real*ct.real + ct.imag*ct.imag
+            state.interior[...] = ctnrm2*(ctnrm2 + ct.real) <= 0.25*c.imag*c.imag
+            state.interior |= (c.real+1.)*(c.real+1.) + c.imag*c.imag <= 0.0625
+        if state.max_iterations < self.max_iterations:
+            self.iterate(c, state)
+        # Un budget plus petit que celui de l'état se lit directement : les pixels divergés après
+        # max_iterations sont simplement considérés comme non divergés
+        has_diverged = state.escaped & (state.iterations < self.max_iterations)
+        iter = np.where(has_diverged, state.iterations, self.max_iterations).astype(np.double)
+        if smooth:
+            iter[has_diverged] += 1 - np.log(0.5*np.log(state.modulus2[has_diverged]))/log(2)
+        return iter
+
+    def iterate(self, c: np.ndarray, state: IterationState):
+        """
+        Reprend l'itération des pixels encore bornés de state, de state.max_iterations à self.max_iterations
+        (même noyau que mandelbrot_vec.py : ensemble compacté des points vivants et détection des orbites périodiques)
+        """
+        live = np.flatnonzero(~(state.escaped | state.interior))
+        n = live.size
+        state_buf = np.empty((2, 6, n), dtype=np.double) # (cr, ci, zr, zi, zr sauvegardé, zi sauvegardé)
+        indices = np.empty((2, n), dtype=np.intp)
+        work = np.empty((4, n), dtype=np.double)         # (zr², zi², |z|², distance² à z sauvegardé)
+        has_diverged = np.empty(n, dtype=bool)
+        is_periodic = np.empty(n, dtype=bool)
+        state_buf[0, 0] = c.real.ravel()[live]
+        state_buf[0, 1] = c.imag.ravel()[live]
+        state_buf[0, 2] = state.zr.ravel()[live]
+        state_buf[0, 3] = state.zi.ravel()[live]
+        state_buf[0, 4:] = np.nan # Pas de valeur sauvegardée avant la prochaine itération 2^k-1
+        indices[0] = live
+        iterations, escaped, interior = state.iterations.ravel(), state.escaped.ravel(), state.interior.ravel()
+        modulus2 = state.modulus2.ravel()
+        radius2 = self.escape_radius*self.escape_radius
+        cur = 0
+        for it in range(state.max_iterations, self.max_iterations):
+            if n == 0: break
+            cr, ci, zr, zi, zrs, zis = state_buf[cur, :, :n]
+            zr2, zi2, mod2, dist2 = work[:, :n]
+            diverged = has_diverged[:n]
+            periodic = is_periodic[:n]
+            # z = z*z + c
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            zi *= zr
+            zi *= 2.
+            zi += ci
+            np.subtract(zr2, zi2, out=zr)
+            zr += cr
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            np.add(zr2, zi2, out=mod2)
+            np.greater(mod2, radius2, out=diverged)
+            nb_diverged = np.count_nonzero(diverged)
+            np.subtract(zr, zrs, out=dist2)
+            np.multiply(dist2, dist2, out=dist2)
+            np.subtract(zi, zis, out=zi2)
+            np.multiply(zi2, zi2, out=zi2)
+            dist2 += zi2
+            np.less(dist2, self.periodicity_tolerance2, out=periodic)
+            nb_periodic = np.count_nonzero(periodic)
+            if it & (it+1) == 0:
+                zrs[:] = zr
+                zis[:] = zi
+            if nb_diverged + nb_periodic > 0:
+                if nb_diverged > 0:
+                    done = indices[cur, :n][diverged]
+                    iterations[done] = it
+                    escaped[done] = True
+                    modulus2[done] = mod2[diverged]
+                if nb_periodic > 0:
+                    interior[indices[cur, :n][periodic & ~diverged]] = True
+                np.logical_or(diverged, periodic, out=diverged)
+                np.logical_not(diverged, out=diverged)
+                m = np.count_nonzero(diverged)
+                np.compress(diverged, state_buf[cur, :, :n], axis=1, out=state_buf[1-cur, :, :m])
+                np.compress(diverged, indices[cur, :n], out=indices[1-cur, :m])
+                cur = 1 - cur
+                n = m
+        # On conserve z pour les pixels toujours bornés : ils repartiront de là au prochain budget
+        remaining = indices[cur, :n]
+        state.zr.ravel()[remaining] = state_buf[cur, 2, :n]
+        state.zi.ravel()[remaining] = state_buf[cur, 3, :n]
+        iterations[remaining] = self.max_iterations
+        state.max_iterations = self.max_iterations
+
+
+# On peut changer les paramètres des prochaines lignes
+escape_radius = 2.
+width, height = 1024, 1024
+xmin, ymin = -2., -1.125
+scaleX = 3./width
+scaleY = 2.25/height
+state_filename = "mandelbrot_state.npz"
+budgets = [int(arg) for arg in sys.argv[1:]] if len(sys.argv) > 1 else [50, 100, 200]
+
+# La vue (et le rayon d'échappement) identifie l'état sauvegardé
+viewport = np.array([xmin, ymin, scaleX, scaleY, width, height, escape_radius])
+x = xmin + scaleX*np.arange(width)
+y = ymin + scaleY*np.arange(height)
+c = x[:, np.newaxis] + 1.j*y[np.newaxis, :]
+
+state = IterationState.load(state_filename, viewport)
+if state is None:
+    state = IterationState.new((width, height))
+else:
+    print(f"État relu depuis '{state_filename}' ({state.max_iterations} itérations déjà effectuées)")
+
+for max_iterations in budgets:
+    mandelbrot_set = MandelbrotSet(max_iterations=max_iterations, escape_radius=escape_radius)
+    nb_live = np.count_nonzero(~(state.escaped | state.interior)) if state.max_iterations < max_iterations else 0
+    deb = time()
+    convergence = mandelbrot_set.convergence(c, state, smooth=True)
+    fin = time()
+    print(f"Temps du calcul de l'ensemble de Mandelbrot ({max_iterations} itérations, {nb_live} pixels repris) : {fin-deb}")
+
+state.save(state_filename, viewport)
+
+# Constitution de l'image résultante :
+deb = time()
+image = Image.fromarray(colorize(convergence.T, palette()))
+fin = time()
+print(f"Temps de constitution de l'image : {fin-deb}")
+image.show()
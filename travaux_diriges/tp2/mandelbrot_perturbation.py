@@ -0,0 +1,110 @@
+# Calcul de l'ensemble de Mandelbrot en python pour des zooms profonds (théorie des perturbations)
+#
+# En complex128, on ne distingue plus deux pixels voisins au delà d'un zoom d'environ 1e-13.
+# On calcule donc une seule orbite de référence Z_n en haute précision (module decimal) au centre de l'image,
+# puis chaque pixel c = C + dc est itéré en float64 sous la forme d'un écart z_n = Z_n + dz_n à cette orbite :
+#     dz_{n+1} = (2 Z_n + dz_n) dz_n + dc
+# Lorsque |Z_n + dz_n| < |dz_n| (le pixel passe plus près de 0 que de la référence : c'est ce qui provoque
+# les "glitchs" de la méthode) ou que l'orbite de référence est épuisée, on rebase le pixel :
+# dz <- Z_n + dz_n et on repart du début de l'orbite de référence.
+# Les écarts restant représentables en float64, la méthode fonctionne jusqu'à des zooms d'environ 1e-300.
+import numpy as np
+from decimal import Decimal, getcontext
+from PIL import Image
+from math import log, log10
+from time import time
+import sys
+from palette import palette, colorize
+
+
+class MandelbrotPerturbation:
+
+    def __init__(self, max_iterations : int, escape_radius : float = 2. ):
+        self.max_iterations = max_iterations
+        self.escape_radius  = escape_radius
+
+    def reference_orbit(self, center_re : str, center_im : str, digits : int) -> np.ndarray:
+        """
+        Calcule en haute précision (digits chiffres significatifs) l'orbite du centre de l'image,
+        arrondie en complex128, jusqu'à divergence ou jusqu'à max_iterations.
+        """
+        getcontext().prec = digits
+        cr, ci = Decimal(center_re), Decimal(center_im)
+        zr, zi = Decimal(0), Decimal(0)
+        radius2 = Decimal(self.escape_radius*self.escape_radius)
+        orbit = [0.j]
+        for it in range(self.max_iterations):
+            zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+            orbit.append(complex(float(zr), float(zi)))
+            if zr*zr + zi*zi > radius2: break
+        return np.array(orbit, dtype=np.complex128)
+
+    def convergence(self, dc: np.ndarray, orbit: np.ndarray, smooth=False, clamp=True) -> np.ndarray:
+        value = self.count_iterations(dc, orbit, smooth)/self.max_iterations
+        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
+
+    def count_iterations(self, dc: np.ndarray, orbit: np.ndarray, smooth=False) -> np.ndarray:
+        dc = np.asarray(dc, dtype=np.complex128).ravel()
+        iter = np.full(dc.size, self.max_iterations, dtype=np.double)
+        modulus = np.empty(dc.size, dtype=np.double)
+        radius2 = self.escape_radius*self.escape_radius
+        last = orbit.size - 1
+        # Ensemble compacté des pixels encore vivants, comme dans mandelbrot_vec.py
+        live = np.arange(dc.size)
+        dcl  = dc.copy()
+        dz   = np.zeros(dc.size, dtype=np.complex128)
+        m    = np.zeros(dc.size, dtype=np.intp) # Indice dans l'orbite de référence de chaque pixel
+        self.nb_rebases = 0
+        for it in range(self.max_iterations):
+            dz = (2*orbit[m] + dz)*dz + dcl
+            m += 1
+            z = orbit[m] + dz
+            mod2 = z.real*z.real + z.imag*z.imag
+            has_diverged = mod2 > radius2
+            if has_diverged.any():
+                iter[live[has_diverged]] = it
+                modulus[live[has_diverged]] = np.sqrt(mod2[has_diverged])
+                keep = ~has_diverged
+                live, dcl, dz, m, z, mod2 = live[keep], dcl[keep], dz[keep], m[keep], z[keep], mod2[keep]
+                if live.size == 0: break
+            rebase = (mod2 < dz.real*dz.real + dz.imag*dz.imag) | (m == last)
+            if rebase.any():
+                dz[rebase] = z[rebase]
+                m[rebase] = 0
+                self.nb_rebases += np.count_nonzero(rebase)
+        if smooth:
+            has_diverged = iter < self.max_iterations
+            iter[has_diverged] += 1 - np.log(np.log(modulus[has_diverged]))/log(2)
+        return iter
+
+
+# On peut changer les paramètres des prochaines lignes
+mandelbrot_set = MandelbrotPerturbation(max_iterations=1000, escape_radius=2.)
+iterations_per_decade = 2500 # Plus on zoome près du bord de l'ensemble, plus il faut d'itérations
+width, height = 256, 256
+center_re = "-0.743643887037158704752191506114774"
+center_im = "0.131825904205311970493132056385139"
+# Séquence de zooms : largeur de la vue de 3 à 3e-20 (un ordre de grandeur par image par défaut)
+nb_images = 21
+if len(sys.argv) > 1:
+    nb_images = int(sys.argv[1])
+
+base_iterations = mandelbrot_set.max_iterations
+deb_total = time()
+for k in range(nb_images):
+    mandelbrot_set.max_iterations = base_iterations + iterations_per_decade*k
+    view_width = 3.*10.**(-k)
+    scaleX = scaleY = view_width/width
+    digits = max(20, int(-log10(scaleX)) + 20)
+    deb = time()
+    orbit = mandelbrot_set.reference_orbit(center_re, center_im, digits)
+    dx = scaleX*(np.arange(width) - 0.5*width)
+    dy = scaleY*(np.arange(height) - 0.5*height)
+    dc = dx[:, np.newaxis] + 1.j*dy[np.newaxis, :]
+    convergence = mandelbrot_set.convergence(dc, orbit, smooth=True).reshape((width, height))
+    fin = time()
+    print(f"Image {k:02d} (largeur {view_width:.1e}, orbite de référence de {orbit.size-1} itérations) : "
+          f"{fin-deb:.2f} s, {mandelbrot_set.nb_rebases} rebasements")
+    image = Image.fromarray(colorize(convergence.T, palette()))
+    image.save(f"mandelbrot_zoom_{k:02d}.png")
+print(f"Temps total de la séquence de zoom : {time()-deb_total}")
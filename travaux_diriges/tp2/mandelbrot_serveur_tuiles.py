@@ -0,0 +1,318 @@
+# Serveur local de tuiles de l'ensemble de Mandelbrot, avec cache
+#
+# Les tuiles (256x256 pixels) sont demandées par HTTP sur localhost :
+#     http://127.0.0.1:8000/<zoom>/<x>/<y>.png?max_iterations=200
+# Au zoom z, la vue [-2.25,0.75]x[-1.5,1.5] est découpée en 2^z x 2^z tuiles.
+# Une tuile est cherchée dans un cache mémoire LRU, puis dans un cache disque (tous deux bornés en taille),
+# et n'est calculée qu'en dernier recours, par un groupe de processus. Une tuile demandée plusieurs fois
+# pendant son calcul n'est calculée qu'une fois.
+#
+# Exemple : python mandelbrot_serveur_tuiles.py [port]
+#           curl -o tuile.png http://127.0.0.1:8000/3/2/4.png
+import numpy as np
+from PIL import Image
+from math import log
+from time import perf_counter
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import threading
+import io
+import os
+import re
+import sys
+from palette import palette, colorize
+
+
+class MandelbrotSet:
+
+    def __init__(self, max_iterations : int, escape_radius : float = 2., periodicity_tolerance : float = 1.E-10 ):
+        self.max_iterations = max_iterations
+        self.escape_radius  = escape_radius
+        self.periodicity_tolerance2 = periodicity_tolerance*periodicity_tolerance
+
+    def convergence(self, c: np.ndarray, smooth=False, clamp=True) -> np.ndarray:
+        value = self.count_iterations(c, smooth)/self.max_iterations
+        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
+
+    def count_iterations(self, c: np.ndarray,  smooth=False) -> np.ndarray:
+        iter: np.ndarray
+
+        c = np.asarray(c, dtype=np.complex128)
+        iter = np.full(c.size, self.max_iterations, dtype=np.double)
+        # On vérifie dans un premier temps si le complexe
+        # n'appartient pas à une zone de convergence connue :
+        #   1. Appartenance au disque C1{(-1,0),1/4} (bulbe de période 2)
+        #   2. Appartenance à la cardioïde {(1/4,0),1/2(1-cos(theta))} (qui contient le disque C0{(0,0),1/4})
+        ct = c - 0.25
+        ctnrm2 = ct.real*ct.real + ct.imag*ct.imag
+        interior = ctnrm2*(ctnrm2 + ct.real) <= 0.25*c.imag*c.imag
+        interior |= (c.real+1.)*(c.real+1.) + c.imag*c.imag <= 0.0625
+        live = np.flatnonzero(~interior)
+        # Sinon on itère, uniquement sur les points encore vivants : on garde un ensemble compacté de ces
+        # points (indices, c et z en parties réelle et imaginaire séparées) qui rétrécit au fil des itérations.
+        # Deux jeux de tampons préalloués : la compaction se fait de l'un vers l'autre, sans allocation.
+        # On détecte de plus les orbites périodiques (méthode de Brent) : z est sauvegardé aux itérations
+        # 2^k-1 et un point dont l'orbite repasse par la valeur sauvegardée est intérieur à l'ensemble.
+        n = live.size
+        state = np.zeros((2, 6, n), dtype=np.double) # (cr, ci, zr, zi, zr sauvegardé, zi sauvegardé)
+        indices = np.empty((2, n), dtype=np.intp)
+        work = np.empty((4, n), dtype=np.double)     # (zr², zi², |z|², distance² à z sauvegardé)
+        has_diverged = np.empty(n, dtype=bool)
+        is_periodic = np.empty(n, dtype=bool)
+        modulus2 = np.empty(c.size, dtype=np.double) if smooth else None
+        state[0, 0] = c.real.ravel()[live]
+        state[0, 1] = c.imag.ravel()[live]
+        indices[0] = live
+        radius2 = self.escape_radius*self.escape_radius
+        cur = 0
+        for it in range(self.max_iterations):
+            if n == 0: break
+            cr, ci, zr, zi, zrs, zis = state[cur, :, :n]
+            zr2, zi2, mod2, dist2 = work[:, :n]
+            diverged = has_diverged[:n]
+            periodic = is_periodic[:n]
+            # z = z*z + c
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            zi *= zr
+            zi *= 2.
+            zi += ci
+            np.subtract(zr2, zi2, out=zr)
+            zr += cr
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            np.add(zr2, zi2, out=mod2)
+            np.greater(mod2, radius2, out=diverged)
+            nb_diverged = np.count_nonzero(diverged)
+            np.subtract(zr, zrs, out=dist2)
+            np.multiply(dist2, dist2, out=dist2)
+            np.subtract(zi, zis, out=zi2)
+            np.multiply(zi2, zi2, out=zi2)
+            dist2 += zi2
+            np.less(dist2, self.periodicity_tolerance2, out=periodic)
+            nb_periodic = np.count_nonzero(periodic)
+            if it & (it+1) == 0:
+                zrs[:] = zr
+                zis[:] = zi
+            if nb_diverged + nb_periodic > 0:
+                if nb_diverged > 0:
+                    escaped = indices[cur, :n][diverged]
+                    iter[escaped] = it
+                    if smooth:
+                        modulus2[escaped] = mod2[diverged]
+                np.logical_or(diverged, periodic, out=diverged)
+                np.logical_not(diverged, out=diverged)
+                m = np.count_nonzero(diverged)
+                np.compress(diverged, state[cur, :, :n], axis=1, out=state[1-cur, :, :m])
+                np.compress(diverged, indices[cur, :n], out=indices[1-cur, :m])
+                cur = 1 - cur
+                n = m
+        if smooth:
+            has_diverged = iter < self.max_iterations
+            iter[has_diverged] += 1 - np.log(0.5*np.log(modulus2[has_diverged]))/log(2)
+        return iter.reshape(c.shape)
+
+
+tile_size = 256
+view_xmin, view_ymin, view_size = -2.25, -1.5, 3.
+lut = None # Table de couleurs, construite une fois par processus de calcul
+
+
+def render_tile(zoom : int, x : int, y : int, max_iterations : int) -> bytes:
+    """
+    Calcule la tuile (zoom, x, y) et renvoie l'image PNG correspondante
+    """
+    global lut
+    if lut is None:
+        lut = palette()
+    scale = view_size/(tile_size << zoom)
+    re = view_xmin + scale*(x*tile_size + np.arange(tile_size))
+    im = view_ymin + scale*(y*tile_size + np.arange(tile_size))
+    c = re[np.newaxis, :] + 1.j*im[:, np.newaxis]
+    convergence = MandelbrotSet(max_iterations=max_iterations).convergence(c, smooth=True)
+    output = io.BytesIO()
+    Image.fromarray(colorize(convergence, lut)).save(output, format="PNG")
+    return output.getvalue()
+
+
+class TileCache:
+    """
+    Cache de tuiles à deux niveaux :
+        - en mémoire, LRU borné à memory_size octets
+        - sur disque dans directory, borné à disk_size octets ; on évince les fichiers les moins récemment
+          utilisés (date de modification, mise à jour à chaque lecture)
+    Le verrou ne protège que les index (LRU mémoire, fichiers du disque et leur taille) : les lectures, écritures
+    et suppressions de fichiers se font en dehors, pour que les requêtes ne s'attendent pas les unes les autres.
+    """
+    def __init__(self, directory : str, memory_size : int, disk_size : int):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.memory_used = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.disk = {}
+        for name in os.listdir(directory):
+            stat = os.stat(os.path.join(directory, name))
+            self.disk[name] = (stat.st_mtime, stat.st_size)
+        self.disk_used = sum(size for _, size in self.disk.values())
+
+    @staticmethod
+    def filename(key) -> str:
+        return "{0}_{1}_{2}_{3}.png".format(*key)
+
+    def get(self, key):
+        """
+        Renvoie (données, "memory" ou "disk"), ou (None, None) si la tuile n'est pas en cache
+        """
+        name = self.filename(key)
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                return data, "memory"
+            if name not in self.disk:
+                return None, None
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            # Fichier évincé (ou réécrit) entre-temps par une autre requête
+            with self.lock:
+                entry = self.disk.pop(name, None)
+                if entry is not None:
+                    self.disk_used -= entry[1]
+            return None, None
+        with self.lock:
+            if name in self.disk:
+                self.disk_used += len(data) - self.disk[name][1]
+                self.disk[name] = (mtime, len(data))
+            self._put_memory(key, data)
+        return data, "disk"
+
+    def put(self, key, data : bytes):
+        with self.lock:
+            self._put_memory(key, data)
+        name = self.filename(key)
+        path = os.path.join(self.directory, name)
+        # Fichier temporaire propre au thread : deux requêtes peuvent écrire la même tuile en même temps
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        mtime = os.stat(path).st_mtime
+        evicted = []
+        with self.lock:
+            if name in self.disk:
+                self.disk_used -= self.disk[name][1]
+            self.disk[name] = (mtime, len(data))
+            self.disk_used += len(data)
+            if self.disk_used > self.disk_size:
+                for old_name, (_, size) in sorted(self.disk.items(), key=lambda item: item[1][0]):
+                    if self.disk_used <= self.disk_size: break
+                    if old_name == name: continue
+                    del self.disk[old_name]
+                    self.disk_used -= size
+                    evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except OSError:
+                pass
+
+    def _put_memory(self, key, data : bytes):
+        if key in self.memory:
+            self.memory_used -= len(self.memory.pop(key))
+        self.memory[key] = data
+        self.memory_used += len(data)
+        while self.memory_used > self.memory_size:
+            _, old = self.memory.popitem(last=False)
+            self.memory_used -= len(old)
+
+
+class TileServer(ThreadingHTTPServer):
+
+    def __init__(self, address, cache : TileCache, pool : ProcessPoolExecutor):
+        super().__init__(address, TileRequestHandler)
+        self.cache = cache
+        self.pool = pool
+        self.pending = {} # Tuiles en cours de calcul : clé -> Future
+        self.pending_lock = threading.Lock()
+
+    def tile(self, key):
+        """
+        Renvoie (données PNG, provenance) de la tuile, en la calculant si besoin
+        """
+        data, origin = self.cache.get(key)
+        if data is not None:
+            return data, origin
+        with self.pending_lock:
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = self.pool.submit(render_tile, *key)
+                self.pending[key] = future
+        try:
+            data = future.result()
+        finally:
+            if owner:
+                with self.pending_lock:
+                    del self.pending[key]
+        if not owner:
+            return data, "shared" # Calcul lancé par une autre requête
+        self.cache.put(key, data)
+        return data, "computed"
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    path_pattern = re.compile(r"^/(\d+)/(\d+)/(\d+)\.png$")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = self.path_pattern.match(url.path)
+        try:
+            zoom, x, y = (int(v) for v in match.groups())
+            max_iterations = int(parse_qs(url.query).get("max_iterations", ["200"])[0])
+        except (AttributeError, ValueError):
+            self.send_error(404, "Usage : /<zoom>/<x>/<y>.png?max_iterations=<n>")
+            return
+        if zoom > 48 or not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom) or not (0 < max_iterations <= 100_000):
+            self.send_error(404, "Tuile hors de la vue")
+            return
+        deb = perf_counter()
+        try:
+            data, origin = self.server.tile((zoom, x, y, max_iterations))
+        except Exception as err:
+            # Erreur dans le processus de calcul (renvoyée par future.result) ou à l'écriture dans le cache
+            self.send_error(500, "Erreur lors du calcul de la tuile", f"{type(err).__name__} : {err}")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Cache", origin)
+        self.send_header("X-Time", f"{perf_counter()-deb:.6f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    # On peut changer les paramètres des prochaines lignes
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    cache = TileCache("tile_cache", memory_size=64 << 20, disk_size=512 << 20)
+    with ProcessPoolExecutor() as pool:
+        server = TileServer(("127.0.0.1", port), cache, pool)
+        print(f"Serveur de tuiles sur http://127.0.0.1:{port}/<zoom>/<x>/<y>.png?max_iterations=<n>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
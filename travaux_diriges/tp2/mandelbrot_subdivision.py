@@ -0,0 +1,192 @@
+# Calcul de l'ensemble de Mandelbrot par subdivision de rectangles (algorithme de Mariani-Silver)
+#
+# L'ensemble de Mandelbrot étant connexe (ainsi que chacune des zones où le nombre d'itérations avant
+# divergence est constant), si tous les pixels du bord d'un rectangle ont le même nombre d'itérations,
+# tout l'intérieur du rectangle a ce même nombre d'itérations : on le remplit sans itérer.
+# Sinon, on coupe le rectangle en deux selon sa plus grande dimension et on recommence.
+import numpy as np
+from PIL import Image
+from math import log
+from time import time
+from palette import palette, colorize
+
+
+class MandelbrotSet:
+
+    def __init__(self, max_iterations : int, escape_radius : float = 2., periodicity_tolerance : float = 1.E-10 ):
+        self.max_iterations = max_iterations
+        self.escape_radius  = escape_radius
+        self.periodicity_tolerance2 = periodicity_tolerance*periodicity_tolerance
+
+    def __contains__(self, c: complex) -> bool:
+        return self.stability(c) == 1
+
+    def convergence(self, c: np.ndarray, smooth=False, clamp=True) -> np.ndarray:
+        value = self.count_iterations(c, smooth)/self.max_iterations
+        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
+
+    def count_iterations(self, c: np.ndarray,  smooth=False) -> np.ndarray:
+        iter: np.ndarray
+
+        c = np.asarray(c, dtype=np.complex128)
+        iter = np.full(c.size, self.max_iterations, dtype=np.double)
+        # On vérifie dans un premier temps si le complexe
+        # n'appartient pas à une zone de convergence connue :
+        #   1. Appartenance au disque C1{(-1,0),1/4} (bulbe de période 2)
+        #   2. Appartenance à la cardioïde {(1/4,0),1/2(1-cos(theta))} (qui contient le disque C0{(0,0),1/4})
+        ct = c - 0.25
+        ctnrm2 = ct.real*ct.real + ct.imag*ct.imag
+        interior = ctnrm2*(ctnrm2 + ct.real) <= 0.25*c.imag*c.imag
+        interior |= (c.real+1.)*(c.real+1.) + c.imag*c.imag <= 0.0625
+        live = np.flatnonzero(~interior)
+        # Sinon on itère, uniquement sur les points encore vivants : on garde un ensemble compacté de ces
+        # points (indices, c et z en parties réelle et imaginaire séparées) qui rétrécit au fil des itérations.
+        # Deux jeux de tampons préalloués : la compaction se fait de l'un vers l'autre, sans allocation.
+        # On détecte de plus les orbites périodiques (méthode de Brent) : z est sauvegardé aux itérations
+        # 2^k-1 et un point dont l'orbite repasse par la valeur sauvegardée est intérieur à l'ensemble.
+        n = live.size
+        state = np.zeros((2, 6, n), dtype=np.double) # (cr, ci, zr, zi, zr sauvegardé, zi sauvegardé)
+        indices = np.empty((2, n), dtype=np.intp)
+        work = np.empty((4, n), dtype=np.double)     # (zr², zi², |z|², distance² à z sauvegardé)
+        has_diverged = np.empty(n, dtype=bool)
+        is_periodic = np.empty(n, dtype=bool)
+        modulus2 = np.empty(c.size, dtype=np.double) if smooth else None
+        state[0, 0] = c.real.ravel()[live]
+        state[0, 1] = c.imag.ravel()[live]
+        indices[0] = live
+        radius2 = self.escape_radius*self.escape_radius
+        cur = 0
+        for it in range(self.max_iterations):
+            if n == 0: break
+            cr, ci, zr, zi, zrs, zis = state[cur, :, :n]
+            zr2, zi2, mod2, dist2 = work[:, :n]
+            diverged = has_diverged[:n]
+            periodic = is_periodic[:n]
+            # z = z*z + c
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            zi *= zr
+            zi *= 2.
+            zi += ci
+            np.subtract(zr2, zi2, out=zr)
+            zr += cr
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            np.add(zr2, zi2, out=mod2)
+            np.greater(mod2, radius2, out=diverged)
+            nb_diverged = np.count_nonzero(diverged)
+            np.subtract(zr, zrs, out=dist2)
+            np.multiply(dist2, dist2, out=dist2)
+            np.subtract(zi, zis, out=zi2)
+            np.multiply(zi2, zi2, out=zi2)
+            dist2 += zi2
+            np.less(dist2, self.periodicity_tolerance2, out=periodic)
+            nb_periodic = np.count_nonzero(periodic)
+            if it & (it+1) == 0:
+                zrs[:] = zr
+                zis[:] = zi
+            if nb_diverged + nb_periodic > 0:
+                if nb_diverged > 0:
+                    escaped = indices[cur, :n][diverged]
+                    iter[escaped] = it
+                    if smooth:
+                        modulus2[escaped] = mod2[diverged]
+                np.logical_or(diverged, periodic, out=diverged)
+                np.logical_not(diverged, out=diverged)
+                m = np.count_nonzero(diverged)
+                np.compress(diverged, state[cur, :, :n], axis=1, out=state[1-cur, :, :m])
+                np.compress(diverged, indices[cur, :n], out=indices[1-cur, :m])
+                cur = 1 - cur
+                n = m
+        if smooth:
+            has_diverged = iter < self.max_iterations
+            iter[has_diverged] += 1 - np.log(0.5*np.log(modulus2[has_diverged]))/log(2)
+        return iter.reshape(c.shape)
+
+def border(rect):
+    """
+    Renvoie les coordonnées (x, y) des pixels du bord du rectangle rect = (x0, y0, x1, y1) (bornes incluses)
+    """
+    x0, y0, x1, y1 = rect
+    xs = np.arange(x0, x1+1)
+    ys = np.arange(y0+1, y1)
+    x = np.concatenate((xs, xs, np.full(ys.size, x0), np.full(ys.size, x1)))
+    y = np.concatenate((np.full(xs.size, y0), np.full(xs.size, y1), ys, ys))
+    return x, y
+
+
+def interior(rect):
+    x0, y0, x1, y1 = rect
+    x, y = np.meshgrid(np.arange(x0+1, x1), np.arange(y0+1, y1), indexing='ij')
+    return x.ravel(), y.ravel()
+
+
+def evaluate(x, y):
+    """
+    Calcule (en un seul appel vectorisé) les pixels (x, y) dont la valeur n'est pas encore connue
+    """
+    global nb_evaluated, nb_iterations
+    unknown = iterations[x, y] < 0
+    x, y = x[unknown], y[unknown]
+    if x.size == 0: return
+    c = -2. + scaleX*x + 1.j*(-1.125 + scaleY*y)
+    values = mandelbrot_set.count_iterations(c, smooth)
+    iterations[x, y] = values
+    nb_evaluated += x.size
+    nb_iterations += values.sum()
+
+
+def mariani_silver():
+    # On traite les rectangles niveau par niveau pour évaluer tous les bords d'un niveau en un seul appel
+    rectangles = [(0, 0, width-1, height-1)]
+    while len(rectangles) > 0:
+        borders = [border(r) for r in rectangles]
+        evaluate(np.concatenate([b[0] for b in borders]), np.concatenate([b[1] for b in borders]))
+        to_compute = []
+        subdivided = []
+        for rect, (x, y) in zip(rectangles, borders):
+            x0, y0, x1, y1 = rect
+            values = iterations[x, y]
+            # En mode lissé, les valeurs diffèrent d'un pixel à l'autre hors de l'ensemble :
+            # on ne remplit alors que les rectangles intérieurs à l'ensemble
+            if np.all(values == values[0]) and (not smooth or values[0] == mandelbrot_set.max_iterations):
+                iterations[x0+1:x1, y0+1:y1] = values[0]
+            elif x1-x0 <= min_size or y1-y0 <= min_size:
+                to_compute.append(interior(rect))
+            elif x1-x0 >= y1-y0:
+                xm = (x0+x1)//2
+                subdivided += [(x0, y0, xm, y1), (xm, y0, x1, y1)]
+            else:
+                ym = (y0+y1)//2
+                subdivided += [(x0, y0, x1, ym), (x0, ym, x1, y1)]
+        if len(to_compute) > 0:
+            evaluate(np.concatenate([p[0] for p in to_compute]), np.concatenate([p[1] for p in to_compute]))
+        rectangles = subdivided
+
+
+# On peut changer les paramètres des prochaines lignes
+mandelbrot_set = MandelbrotSet(max_iterations=1000, escape_radius=2.)
+width, height = 1024, 1024
+smooth = False # Avec le lissage, seuls les rectangles intérieurs à l'ensemble peuvent être remplis
+min_size = 8   # Taille en dessous de laquelle on calcule directement l'intérieur d'un rectangle
+
+scaleX = 3./width
+scaleY = 2.25/height
+iterations = np.full((width, height), -1., dtype=np.double)
+nb_evaluated = 0
+nb_iterations = 0.
+# Calcul de l'ensemble de mandelbrot :
+deb = time()
+mariani_silver()
+convergence = np.clip(iterations/mandelbrot_set.max_iterations, 0., 1.)
+fin = time()
+print(f"Temps du calcul de l'ensemble de Mandelbrot : {fin-deb}")
+print(f"Pixels évalués : {nb_evaluated} sur {width*height} ({100.*nb_evaluated/(width*height):.1f}%)")
+print(f"Itérations effectuées (borne supérieure) : {100.*nb_iterations/iterations.sum():.1f}% de celles d'un calcul complet")
+
+# Constitution de l'image résultante :
+deb = time()
+image = Image.fromarray(colorize(convergence.T, palette()))
+fin = time()
+print(f"Temps de constitution de l'image : {fin-deb}")
+image.show()
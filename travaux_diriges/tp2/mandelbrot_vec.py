@@ -4,14 +4,15 @@ from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
+from palette import palette, colorize
 
 
 class MandelbrotSet:
 
-    def __init__(self, max_iterations : int, escape_radius : float = 2. ):
+    def __init__(self, max_iterations : int, escape_radius : float = 2., periodicity_tolerance : float = 1.E-10 ):
         self.max_iterations = max_iterations
         self.escape_radius  = escape_radius
+        self.periodicity_tolerance2 = periodicity_tolerance*periodicity_tolerance
 
     def __contains__(self, c: complex) -> bool:
         return self.stability(c) == 1
@@ -21,34 +22,82 @@ class MandelbrotSet:
         return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
 
     def count_iterations(self, c: np.ndarray,  smooth=False) -> np.ndarray:
-        z:    np.ndarray
         iter: np.ndarray
 
+        c = np.asarray(c, dtype=np.complex128)
+        iter = np.full(c.size, self.max_iterations, dtype=np.double)
         # On vérifie dans un premier temps si le complexe
         # n'appartient pas à une zone de convergence connue :
-        #   1. Appartenance aux disques  C0{(0,0),1/4} et C1{(-1,0),1/4}
-        iter = self.max_iterations * np.ones(c.shape, dtype=np.double)
-        mask = (np.abs(c) >= 0.25) | (np.abs(c+1.) >= 0.25)
-        #  2.  Appartenance à la cardioïde {(1/4,0),1/2(1-cos(theta))}
-        #if (c.real > -0.75) and (c.real < 0.5):
-        #    ct = c.real-0.25 + 1.j * c.imag
-        #    ctnrm2 = abs(ct)
-        #    if ctnrm2 < 0.5*(1-ct.real/max(ctnrm2, 1.E-14)):
-        #        return self.max_iterations
-        # Sinon on itère
-        from scipy import linalg as slinalg
-        z = np.zeros(c.shape, dtype=np.complex128)
+        #   1. Appartenance au disque C1{(-1,0),1/4} (bulbe de période 2)
+        #   2. Appartenance à la cardioïde {(1/4,0),1/2(1-cos(theta))} (qui contient le disque C0{(0,0),1/4})
+        ct = c - 0.25
+        ctnrm2 = ct.real*ct.real + ct.imag*ct.imag
+        interior = ctnrm2*(ctnrm2 + ct.real) <= 0.25*c.imag*c.imag
+        interior |= (c.real+1.)*(c.real+1.) + c.imag*c.imag <= 0.0625
+        live = np.flatnonzero(~interior)
+        # Sinon on itère, uniquement sur les points encore vivants : on garde un ensemble compacté de ces
+        # points (indices, c et z en parties réelle et imaginaire séparées) qui rétrécit au fil des itérations.
+        # Deux jeux de tampons préalloués : la compaction se fait de l'un vers l'autre, sans allocation.
+        # On détecte de plus les orbites périodiques (méthode de Brent) : z est sauvegardé aux itérations
+        # 2^k-1 et un point dont l'orbite repasse par la valeur sauvegardée est intérieur à l'ensemble.
+        n = live.size
+        state = np.zeros((2, 6, n), dtype=np.double) # (cr, ci, zr, zi, zr sauvegardé, zi sauvegardé)
+        indices = np.empty((2, n), dtype=np.intp)
+        work = np.empty((4, n), dtype=np.double)     # (zr², zi², |z|², distance² à z sauvegardé)
+        has_diverged = np.empty(n, dtype=bool)
+        is_periodic = np.empty(n, dtype=bool)
+        modulus2 = np.empty(c.size, dtype=np.double) if smooth else None
+        state[0, 0] = c.real.ravel()[live]
+        state[0, 1] = c.imag.ravel()[live]
+        indices[0] = live
+        radius2 = self.escape_radius*self.escape_radius
+        cur = 0
         for it in range(self.max_iterations):
-            z[mask] = z[mask]*z[mask] + c[mask]
-            has_diverged = np.abs(z) > self.escape_radius
-            if has_diverged.size > 0:
-                iter[has_diverged] = np.minimum(iter[has_diverged], it)
-                mask = mask & ~has_diverged
-            if np.any(mask) == False : break
-        has_diverged = np.abs(z) > 2
+            if n == 0: break
+            cr, ci, zr, zi, zrs, zis = state[cur, :, :n]
+            zr2, zi2, mod2, dist2 = work[:, :n]
+            diverged = has_diverged[:n]
+            periodic = is_periodic[:n]
+            # z = z*z + c
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            zi *= zr
+            zi *= 2.
+            zi += ci
+            np.subtract(zr2, zi2, out=zr)
+            zr += cr
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            np.add(zr2, zi2, out=mod2)
+            np.greater(mod2, radius2, out=diverged)
+            nb_diverged = np.count_nonzero(diverged)
+            np.subtract(zr, zrs, out=dist2)
+            np.multiply(dist2, dist2, out=dist2)
+            np.subtract(zi, zis, out=zi2)
+            np.multiply(zi2, zi2, out=zi2)
+            dist2 += zi2
+            np.less(dist2, self.periodicity_tolerance2, out=periodic)
+            nb_periodic = np.count_nonzero(periodic)
+            if it & (it+1) == 0:
+                zrs[:] = zr
+                zis[:] = zi
+            if nb_diverged + nb_periodic > 0:
+                if nb_diverged > 0:
+                    escaped = indices[cur, :n][diverged]
+                    iter[escaped] = it
+                    if smooth:
+                        modulus2[escaped] = mod2[diverged]
+                np.logical_or(diverged, periodic, out=diverged)
+                np.logical_not(diverged, out=diverged)
+                m = np.count_nonzero(diverged)
+                np.compress(diverged, state[cur, :, :n], axis=1, out=state[1-cur, :, :m])
+                np.compress(diverged, indices[cur, :n], out=indices[1-cur, :m])
+                cur = 1 - cur
+                n = m
         if smooth:
-            iter[has_diverged] += 1 - np.log(np.log(np.abs(z[has_diverged])))/log(2)
-        return iter
+            has_diverged = iter < self.max_iterations
+            iter[has_diverged] += 1 - np.log(0.5*np.log(modulus2[has_diverged]))/log(2)
+        return iter.reshape(c.shape)
 
 # On peut changer les paramètres des deux prochaines lignes
 mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
@@ -60,15 +109,14 @@ convergence = np.empty((width, height), dtype=np.double)
 # Calcul de l'ensemble de mandelbrot :
 deb = time()
 for y in range(height):
-    #for x in range(width):
-    c = np.array([complex(-2. + scaleX*x, -1.125 + scaleY * y) for x in range(width)])
+    c = -2. + scaleX*np.arange(width) + 1.j*(-1.125 + scaleY * y)
     convergence[:, y] = mandelbrot_set.convergence(c, smooth=True)
 fin = time()
 print(f"Temps du calcul de l'ensemble de Mandelbrot : {fin-deb}")
 
 # Constitution de l'image résultante :
 deb = time()
-image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
+image = Image.fromarray(colorize(convergence.T, palette()))
 fin = time()
 print(f"Temps de constitution de l'image : {fin-deb}")
 image.show()
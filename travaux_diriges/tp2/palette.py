@@ -0,0 +1,37 @@
+# Colorisation des images de l'ensemble de Mandelbrot, commune aux scripts du TP2 :
+# table de couleurs (palette), colorisation par la table (colorize) et quantification 16 bits (quantize)
+import numpy as np
+
+
+def palette(size : int = 256) -> np.ndarray:
+    """
+    Table de couleurs (size, 3) en uint8 échantillonnant la palette plasma (size = 256 ou 65536 : index 8 ou 16 bits).
+    plasma n'a que 256 couleurs : on les interpole linéairement, si bien qu'une table de 65536 entrées est plus
+    fine que la palette d'origine (resampled ne ferait que répéter chaque couleur).
+    matplotlib n'est importé que pour construire la table, pas au démarrage du script.
+    """
+    import matplotlib
+    from matplotlib.colors import LinearSegmentedColormap
+    plasma = matplotlib.colormaps['plasma']
+    cmap = LinearSegmentedColormap.from_list('plasma', plasma(np.linspace(0, 1, plasma.N)), N=size)
+    return np.uint8(cmap(np.linspace(0, 1, size))[:, :3]*255)
+
+
+def colorize(convergence : np.ndarray, lut : np.ndarray) -> np.ndarray:
+    """
+    Quantifie la convergence (dans [0,1], ou déjà quantifiée sur 16 bits par quantize) en index de la table lut
+    et renvoie directement l'image RGB en uint8
+    """
+    size = lut.shape[0]
+    if convergence.dtype == np.uint16:
+        index = ((convergence.astype(np.uint32)*size) >> 16).astype(np.uint16)
+    else:
+        index = np.clip(convergence*size, 0, size-1).astype(np.uint16)
+    return np.take(lut, index, axis=0)
+
+
+def quantize(convergence : np.ndarray) -> np.ndarray:
+    """
+    Quantifie la convergence (dans [0,1]) sur 16 bits : 2 octets par pixel au lieu de 8 pour le float64
+    """
+    return np.clip(convergence*65536, 0, 65535).astype(np.uint16)
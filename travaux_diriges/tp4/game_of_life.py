@@ -83,13 +83,167 @@ class Grille:
         req1.Wait()
         req2.Wait()
 
+def pack_rows(cells : np.ndarray) -> np.ndarray:
+    """
+    Range les lignes de cellules (uint8, 0 ou 1) par paquets de 64 dans des mots uint64 : la cellule j d'une ligne
+    est le bit j%64 du mot j//64. Les bits au delà de la dernière colonne sont nuls.
+    """
+    nb_words = (cells.shape[1]+63)//64
+    bytes_ = np.packbits(cells, axis=1, bitorder='little')
+    padded = np.zeros((cells.shape[0], 8*nb_words), dtype=np.uint8)
+    padded[:, :bytes_.shape[1]] = bytes_
+    return padded.view('<u8').astype(np.uint64)
+
+def unpack_rows(words : np.ndarray, width : int) -> np.ndarray:
+    """
+    Opération inverse de pack_rows : renvoie les width premières cellules de chaque ligne en uint8
+    """
+    return np.unpackbits(np.ascontiguousarray(words, dtype='<u8').view(np.uint8), axis=1, bitorder='little')[:, :width]
+
+class GrilleBits(Grille):
+    """
+    Même grille torique que Grille, mais chaque ligne est rangée dans des mots de 64 bits (64 cellules par mot)
+    et la génération suivante est calculée sur des lignes entières par opérations logiques (additionneurs
+    bit à bit) au lieu de huit np.roll sur des octets. Les lignes fantômes échangées sont 8 fois plus petites.
+    La grille n'est jamais affichée telle quelle : le processus d'affichage reçoit les mots et les dépaquette (unpack_rows).
+    """
+    def __init__(self, rank : int, nbp : int, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+        super().__init__(rank, nbp, dim, init_pattern, color_life, color_dead)
+        if init_pattern is None:
+            self.cells = np.random.randint(2, size=(self.dimensions_loc[0]+2, dim[1]), dtype=np.uint8)
+        self.words = pack_rows(self.cells)
+        del self.cells
+        # Position du bit de la dernière colonne dans le dernier mot, et masque des bits utiles de ce mot
+        self.last_bit = np.uint64((dim[1]-1) % 64)
+        self.last_mask = np.uint64((1 << ((dim[1]-1) % 64 + 1)) - 1)
+
+    def shift_columns(self, x : np.ndarray):
+        """
+        Renvoie les lignes de x décalées d'une colonne (la cellule j reçoit la cellule j-1, puis j+1), sur le tore
+        """
+        one, high = np.uint64(1), np.uint64(63)
+        left  = (x << one) | (np.roll(x, 1, axis=1) >> high)
+        left[:, 0] |= (x[:, -1] >> self.last_bit) & one
+        right = (x >> one) | (np.roll(x, -1, axis=1) << high)
+        right[:, -1] |= (x[:, 0] & one) << self.last_bit
+        return left, right
+
+    def compute_next_iteration(self):
+        """
+        Calcule la prochaine génération de cellules en suivant les règles du jeu de la vie.
+        Renvoie les cellules modifiées sous forme de mots de bits (lignes fantômes exclues)
+        """
+        x = self.words
+        left, right = self.shift_columns(x)
+        # Somme (sur deux bits s0 + 2 s1) des trois cellules gauche, centre, droite de chaque ligne
+        s0 = left ^ x ^ right
+        s1 = (left & x) | (right & (left ^ x))
+        # Ligne de la cellule : seulement les voisines gauche et droite
+        m0 = (left ^ right)[1:-1]
+        m1 = (left & right)[1:-1]
+        u0, u1 = s0[:-2], s1[:-2] # Ligne du dessus
+        d0, d1 = s0[2:],  s1[2:]  # Ligne du dessous
+        # Nombre de voisines = bit0 + 2*(u1 + m1 + d1 + retenue), avec bit0 et retenue sommes des bits de poids 1
+        bit0  = u0 ^ m0 ^ d0
+        carry = (u0 & m0) | (d0 & (u0 ^ m0))
+        # Exactement un bit de poids 2 : 2 ou 3 voisines
+        one = (u1 ^ m1 ^ d1 ^ carry) & ~((u1 & m1) | (d1 & carry))
+        alive = x[1:-1]
+        next_words = one & (bit0 | alive)
+        next_words[:, -1] &= self.last_mask
+        diff_words = next_words ^ alive
+        self.words[1:-1] = next_words
+        return diff_words
+
+    def update_ghost_cells(self):
+        """
+        Met à jour les lignes fantômes (en mots de 64 cellules)
+        """
+        req1 = newCom.Irecv(self.words[-1,:], source = (newCom.rank+1)%newCom.size, tag=101)
+        req2 = newCom.Irecv(self.words[0,:], source = (newCom.rank+newCom.size-1)%newCom.size, tag=102)
+        newCom.Send(self.words[-2,:], dest = (newCom.rank+1)%newCom.size, tag=102)
+        newCom.Send(self.words[1,:], dest = (newCom.rank+newCom.size-1)%newCom.size, tag=101)
+        req1.Wait()
+        req2.Wait()
+
+class GrilleTuiles(Grille):
+    """
+    Même grille que Grille, mais découpée en tuiles de tile_size x tile_size cellules dont on ne recalcule que
+    celles qui peuvent changer : une tuile est active si l'une de ses cellules a changé à la génération précédente,
+    et seules les tuiles actives, leurs huit voisines et les tuiles du bord touchées par une ligne fantôme modifiée
+    sont recalculées. Les attributs nb_active et nb_computed donnent le nombre de tuiles actives et recalculées.
+    """
+    def __init__(self, rank : int, nbp : int, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), tile_size : int = 16):
+        super().__init__(rank, nbp, dim, init_pattern, color_life, color_dead)
+        if init_pattern is None:
+            self.cells = np.random.randint(2, size=(self.dimensions_loc[0]+2, dim[1]), dtype=np.uint8)
+        self.tile_size = tile_size
+        nb_rows = (self.dimensions_loc[0]+tile_size-1)//tile_size
+        nb_cols = (dim[1]+tile_size-1)//tile_size
+        # Indices des lignes et des colonnes de chaque tuile, encadrées d'une ligne et d'une colonne de chaque côté
+        # (lignes fantômes, colonnes sur le tore). Les tuiles du bord sont complétées par des cellules non valides.
+        offsets = np.arange(-1, tile_size+1)
+        self.row_index = np.minimum(1 + tile_size*np.arange(nb_rows)[:, np.newaxis] + offsets, self.dimensions_loc[0]+1)
+        self.col_index = (tile_size*np.arange(nb_cols)[:, np.newaxis] + offsets) % dim[1]
+        self.row_valid = tile_size*np.arange(nb_rows)[:, np.newaxis] + offsets[1:-1] < self.dimensions_loc[0]
+        self.col_valid = tile_size*np.arange(nb_cols)[:, np.newaxis] + offsets[1:-1] < dim[1]
+        # Au départ toutes les tuiles sont actives
+        self.active = np.ones((nb_rows, nb_cols), dtype=bool)
+        self.ghosts = self.cells[[0, -1], :].copy()
+        self.nb_active = self.active.size
+        self.nb_computed = 0
+
+    def tiles_to_compute(self):
+        """
+        Tuiles actives et leurs voisines, plus les tuiles du bord voisines d'une cellule fantôme modifiée
+        """
+        compute = self.active.copy()
+        compute[1:]  |= self.active[:-1]
+        compute[:-1] |= self.active[1:]
+        compute |= np.roll(compute, 1, axis=1) | np.roll(compute, -1, axis=1)
+        width = self.dimensions[1]
+        for row, ghost, previous in ((0, self.cells[0], self.ghosts[0]), (-1, self.cells[-1], self.ghosts[1])):
+            changed = np.flatnonzero(ghost != previous)
+            for shift in (-1, 0, 1):
+                compute[row, ((changed+shift) % width)//self.tile_size] = True
+        return compute
+
+    def compute_next_iteration(self):
+        """
+        Calcule la prochaine génération de cellules des tuiles qui peuvent changer, toutes à la fois
+        """
+        cells = self.cells
+        ts = self.tile_size
+        ti, tj = np.nonzero(self.tiles_to_compute())
+        self.ghosts[...] = cells[[0, -1], :]
+        rows, cols = self.row_index[ti][:, :, np.newaxis], self.col_index[tj][:, np.newaxis, :]
+        block = cells[rows, cols]
+        neighbours_count = sum(block[:, 1+i:ts+1+i, 1+j:ts+1+j] for i in (-1, 0, 1) for j in (-1, 0, 1) if (i != 0 or j != 0))
+        tiles = block[:, 1:-1, 1:-1]
+        next_tiles = (neighbours_count == 3) | (tiles & (neighbours_count == 2))
+        valid = self.row_valid[ti][:, :, np.newaxis] & self.col_valid[tj][:, np.newaxis, :]
+        diff_tiles = (next_tiles != tiles) & valid
+        self.active[...] = False
+        self.active[ti, tj] = diff_tiles.any(axis=(1, 2))
+        # Les tuiles sont recopiées une fois toutes calculées : leurs voisines ont lu l'ancienne génération
+        rows = np.broadcast_to(rows[:, 1:-1, :], valid.shape)[valid]
+        cols = np.broadcast_to(cols[:, :, 1:-1], valid.shape)[valid]
+        cells[rows, cols] = next_tiles[valid]
+        diff_cells = np.zeros(cells.shape, dtype=bool)
+        diff_cells[rows, cols] = diff_tiles[valid]
+        self.nb_active = np.count_nonzero(self.active)
+        self.nb_computed = ti.size
+        return diff_cells
+
 class App:
     """
     Cette classe décrit la fenêtre affichant la grille à l'écran
         - geometry est un tuple de deux entiers donnant le nombre de pixels verticaux et horizontaux (dans cet ordre)
         - grid est la grille décrivant l'automate cellulaire (voir plus haut)
+    L'image mise à l'échelle de la grille et le quadrillage sont gardés d'un affichage à l'autre : seuls les
+    rectangles (par tuiles de dirty_tile x dirty_tile cellules) qui contiennent une cellule modifiée sont redessinés.
     """
-    def __init__(self, geometry, grid):
+    def __init__(self, geometry, grid, dirty_tile : int = 8):
         self.grid = grid
         # Calcul de la taille d'une cellule par rapport à la taille de la fenêtre et de la grille à afficher :
         self.size_x = geometry[1]//grid.dimensions[1]
@@ -105,17 +259,64 @@ class App:
         self.screen = pg.display.set_mode((self.width,self.height))
         #
         self.canvas_cells = []
-        self.colors = np.array([self.grid.col_dead[:-1], self.grid.col_life[:-1]])
+        self.colors = np.array([self.grid.col_dead[:-1], self.grid.col_life[:-1]], dtype=np.uint8)
+        self.dirty_tile = dirty_tile
+        # Image de la grille à l'échelle de la fenêtre, et quadrillage dessiné une fois pour toutes
+        # (sur fond transparent : couleur clé magenta)
+        self.surface = pg.Surface((self.width, self.height))
+        self.lines = None
+        if self.draw_color is not None:
+            self.lines = pg.Surface((self.width, self.height))
+            self.lines.fill(pg.Color('magenta'))
+            self.lines.set_colorkey(pg.Color('magenta'))
+            [pg.draw.line(self.lines, self.draw_color, (0,i*self.size_y), (self.width,i*self.size_y)) for i in range(self.grid.dimensions[0])]
+            [pg.draw.line(self.lines, self.draw_color, (j*self.size_x,0), (j*self.size_x,self.height)) for j in range(self.grid.dimensions[1])]
+        self.drawn_cells = None
+
+    def draw_cells(self, pixels : np.ndarray, cells : np.ndarray, i0 : int, i1 : int, j0 : int, j1 : int) -> pg.Rect:
+        """
+        Redessine dans pixels (pixels de self.surface) les cellules des lignes i0 à i1-1 et des colonnes j0 à j1-1,
+        et renvoie le rectangle de la fenêtre correspondant. La ligne 0 de la grille est en bas de la fenêtre.
+        """
+        nb_rows = self.grid.dimensions[0]
+        block = self.colors[cells[i0:i1, j0:j1].T[:, ::-1]]
+        block = np.repeat(np.repeat(block, self.size_x, axis=0), self.size_y, axis=1)
+        x, y = j0*self.size_x, (nb_rows-i1)*self.size_y
+        pixels[x:x+block.shape[0], y:y+block.shape[1]] = block
+        return pg.Rect(x, y, block.shape[0], block.shape[1])
 
-    def draw(self):
-        surface = pg.surfarray.make_surface(self.colors[self.grid.cells[1:-1,:].T])
-        surface = pg.transform.flip(surface, False, True)
-        surface = pg.transform.scale(surface, (self.width, self.height))
-        self.screen.blit(surface, (0,0))
-        if (self.draw_color is not None):
-            [pg.draw.line(self.screen, self.draw_color, (0,i*self.size_y), (self.width,i*self.size_y)) for i in range(self.grid.dimensions[0])]
-            [pg.draw.line(self.screen, self.draw_color, (j*self.size_x,0), (j*self.size_x,self.height)) for j in range(self.grid.dimensions[1])]
-        pg.display.update()
+    def draw(self, diff_cells : np.ndarray = None):
+        """
+        Affiche la grille. diff_cells (même forme que grid.cells[1:-1,:]) indique les cellules modifiées depuis le
+        dernier affichage ; s'il n'est pas donné, on le calcule en comparant avec la grille affichée la dernière fois.
+        """
+        cells = self.grid.cells[1:-1,:]
+        dirty = None
+        if self.drawn_cells is not None:
+            if diff_cells is None:
+                diff_cells = cells != self.drawn_cells
+            # Tuiles contenant au moins une cellule modifiée
+            t = self.dirty_tile
+            nb_ti, nb_tj = -(-cells.shape[0]//t), -(-cells.shape[1]//t)
+            padded = np.zeros((nb_ti*t, nb_tj*t), dtype=bool)
+            padded[:cells.shape[0], :cells.shape[1]] = diff_cells
+            dirty = padded.reshape(nb_ti, t, nb_tj, t).any(axis=(1, 3))
+        if dirty is None or np.count_nonzero(dirty) > dirty.size//4:
+            # Premier affichage ou beaucoup de tuiles modifiées : on redessine toute l'image d'un coup
+            surface = pg.surfarray.make_surface(self.colors[cells.T[:, ::-1]])
+            pg.transform.scale(surface, (self.width, self.height), self.surface)
+            rects = [self.surface.get_rect()]
+        else:
+            pixels = pg.surfarray.pixels3d(self.surface)
+            rects = [self.draw_cells(pixels, cells, ti*t, min((ti+1)*t, cells.shape[0]), tj*t, min((tj+1)*t, cells.shape[1]))
+                     for ti, tj in zip(*np.nonzero(dirty))]
+            del pixels
+        self.drawn_cells = cells.copy()
+        for rect in rects:
+            self.screen.blit(self.surface, rect, rect)
+            if self.lines is not None:
+                self.screen.blit(self.lines, rect, rect)
+        pg.display.update(rects)
 
 
 if __name__ == '__main__':
@@ -146,8 +347,14 @@ if __name__ == '__main__':
     if len(sys.argv) > 3 :
         resx = int(sys.argv[2])
         resy = int(sys.argv[3])
+    # Moteur de calcul des processus de calcul : "octets" (Grille, par défaut), "bits" (GrilleBits, 64 cellules par mot)
+    # ou "tuiles" (GrilleTuiles, seules les tuiles qui peuvent changer sont recalculées)
+    engine = 'octets'
+    if len(sys.argv) > 4 :
+        engine = sys.argv[4]
     print(f"Pattern initial choisi : {choice}")
     print(f"resolution ecran : {resx,resy}")
+    print(f"moteur de calcul : {engine}")
     try:
         init_pattern = dico_patterns[choice]
     except KeyError:
@@ -160,9 +367,13 @@ if __name__ == '__main__':
         loop = True
         while loop:
             globCom.send(1, dest=1)
-            appli.grid.cells[1:-1,:] = globCom.recv(source=1)
+            cells, diff = globCom.recv(source=1)
+            if engine == 'bits':
+                cells = unpack_rows(cells, grid.dimensions[1])
+                diff = unpack_rows(diff, grid.dimensions[1])
+            appli.grid.cells[1:-1,:] = cells
             t2 = time.time()
-            appli.draw()
+            appli.draw(diff != 0)
             t3 = time.time()
             for event in pg.event.get():
                 if event.type == pg.QUIT:
@@ -171,14 +382,24 @@ if __name__ == '__main__':
                     globCom.send(-1,dest=1)
             print(f"Temps affichage : {t3-t2:2.2e} secondes", flush=True)
     else:
-        grid = Grille(newCom.rank, newCom.size, *init_pattern)
+        if engine == 'bits':
+            grid = GrilleBits(newCom.rank, newCom.size, *init_pattern)
+            cells = grid.words
+            print(f"rank loc : {newCom.rank}, cells locales : \n{unpack_rows(cells, grid.dimensions[1]).T}")
+        else:
+            grid = GrilleTuiles(newCom.rank, newCom.size, *init_pattern) if engine == 'tuiles' else Grille(newCom.rank, newCom.size, *init_pattern)
+            cells = grid.cells
+            print(f"rank loc : {newCom.rank}, cells locales : \n{cells.T}")
         grid.update_ghost_cells()
-        print(f"rank loc : {newCom.rank}, cells locales : \n{grid.cells.T}")
 
-        grid_glob = None
+        # Le rassemblement porte sur les mots de bits avec le moteur "bits" (8 fois moins d'octets)
+        # Les cellules modifiées sont celles qui diffèrent de la dernière grille envoyée à l'affichage (sent_glob) :
+        # on ne les calcule qu'au moment d'un envoi, pas à chaque génération
+        grid_glob = sent_glob = None
         if newCom.rank == 0:
-            grid_glob = np.zeros(init_pattern[0], dtype=np.uint8)
-        sendcounts = np.array(newCom.gather(grid.cells[1:-1,:].size, root=0))
+            grid_glob = np.zeros((init_pattern[0][0], cells.shape[1]), dtype=cells.dtype)
+            sent_glob = np.zeros_like(grid_glob)
+        sendcounts = np.array(newCom.gather(cells[1:-1,:].size, root=0))
 
         loop = True
         while loop:
@@ -187,13 +408,20 @@ if __name__ == '__main__':
             diff = grid.compute_next_iteration()
             grid.update_ghost_cells()
             t2 = time.time()
-            newCom.Gatherv(grid.cells[1:-1,:], [grid_glob, sendcounts], root=0)
+            cells = grid.words if engine == 'bits' else grid.cells
+            newCom.Gatherv(cells[1:-1,:], [grid_glob, sendcounts], root=0)
             if newCom.rank == 0:
                 if (globCom.Iprobe(source=0)):
                     a = globCom.recv(source=0)
                     if a==-1:
                         loop = False
                     else:
-                        globCom.send(grid_glob, dest=0)
-            print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes", flush=True)
+                        # Le ou exclusif marque les cellules (ou les bits des mots) qui ont changé
+                        globCom.send((grid_glob, grid_glob ^ sent_glob), dest=0)
+                        sent_glob[...] = grid_glob
+            if engine == 'tuiles':
+                print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes, tuiles actives : {grid.nb_active}, "
+                      f"recalculées : {grid.nb_computed}/{grid.active.size}", flush=True)
+            else:
+                print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes", flush=True)
 
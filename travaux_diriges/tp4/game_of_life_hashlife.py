@@ -0,0 +1,408 @@
+"""
+Le jeu de la vie par l'algorithme HashLife
+##########################################
+La grille n'est plus un tableau de cellules mais un arbre quaternaire : un noeud de niveau k décrit un carré de
+2^k x 2^k cellules par ses quatre quarts (nw, ne, sw, se) de niveau k-1, les feuilles (niveau 0) étant les deux
+cellules morte et vivante. Les noeuds sont canoniques : deux carrés identiques sont le même objet, de sorte qu'un
+motif régulier (canon, moteur, ...) ne stocke qu'une fois chacune de ses parties répétées.
+
+Pour un noeud de niveau k, on mémorise le carré central de niveau k-1 après 2^j générations (j <= k-2). Ce résultat
+ne dépend que du noeud : il est calculé une fois et réutilisé partout où ce carré réapparaît, dans l'espace comme
+dans le temps. On avance ainsi de 2^j générations par étape, j pouvant être grand (millions de générations).
+
+Deux univers possibles :
+    - "plan" : plan infini, l'univers est agrandi autant que nécessaire et la fenêtre affichée est celle de la grille
+      du motif choisi (les cellules qui en sortent continuent d'évoluer hors de l'écran)
+    - "tore" : tore de 2^n x 2^n cellules (les dimensions du motif sont arrondies à la puissance de 2 supérieure)
+
+Les noeuds sont rangés dans une table dont la taille est bornée : au delà de max_nodes noeuds, on ne garde que les
+noeuds de l'univers courant et on oublie les résultats mémorisés (ils seront recalculés au besoin).
+
+Exemple : python game_of_life_hashlife.py glider_gun 800 800 10 plan   (2^10 générations par étape)
+"""
+import pygame  as pg
+import numpy   as np
+
+
+class Node:
+    """
+    Noeud (canonique) de l'arbre quaternaire : carré de 2^level x 2^level cellules.
+    results[j] est le carré central (niveau level-1) après 2^j générations.
+    """
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population', 'results')
+
+    def __init__(self, level : int, nw, ne, sw, se, population : int):
+        self.level = level
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+        self.population = population
+        self.results = None
+
+
+class HashLife:
+    """
+    Table des noeuds canoniques et calcul des générations successives par HashLife.
+        - max_nodes : nombre de noeuds au delà duquel collect (appelé par l'utilisateur) vide la table
+    """
+    def __init__(self, max_nodes : int = 500_000):
+        self.max_nodes = max_nodes
+        self.off = Node(0, None, None, None, None, 0)
+        self.on  = Node(0, None, None, None, None, 1)
+        self.table = {}
+        self.empty = [self.off]
+
+    def join(self, nw : Node, ne : Node, sw : Node, se : Node) -> Node:
+        """
+        Renvoie le noeud canonique de quarts nw, ne, sw et se (eux-mêmes canoniques)
+        """
+        key = (id(nw), id(ne), id(sw), id(se))
+        node = self.table.get(key)
+        if node is None:
+            node = Node(nw.level+1, nw, ne, sw, se, nw.population+ne.population+sw.population+se.population)
+            self.table[key] = node
+        return node
+
+    def empty_node(self, level : int) -> Node:
+        while len(self.empty) <= level:
+            e = self.empty[-1]
+            self.empty.append(self.join(e, e, e, e))
+        return self.empty[level]
+
+    def from_cells(self, cells : np.ndarray) -> Node:
+        """
+        Construit le noeud d'un tableau carré de cellules (0 ou 1) de côté 2^k
+        """
+        if cells.shape[0] == 1:
+            return self.on if cells[0, 0] else self.off
+        if not cells.any():
+            return self.empty_node(cells.shape[0].bit_length()-1)
+        h = cells.shape[0]//2
+        return self.join(self.from_cells(cells[:h, :h]), self.from_cells(cells[:h, h:]),
+                         self.from_cells(cells[h:, :h]), self.from_cells(cells[h:, h:]))
+
+    def window(self, node : Node, row : int, col : int, out : np.ndarray, row0 : int, col0 : int):
+        """
+        Recopie dans out (fenêtre dont le coin est la cellule (row0, col0)) les cellules du noeud node
+        dont le coin est la cellule (row, col). Les noeuds vides ou hors de la fenêtre ne sont pas parcourus.
+        """
+        size = 1 << node.level
+        if (node.population == 0 or row >= row0+out.shape[0] or col >= col0+out.shape[1]
+                or row+size <= row0 or col+size <= col0):
+            return
+        if node.level == 0:
+            out[row-row0, col-col0] = 1
+            return
+        h = size//2
+        self.window(node.nw, row,   col,   out, row0, col0)
+        self.window(node.ne, row,   col+h, out, row0, col0)
+        self.window(node.sw, row+h, col,   out, row0, col0)
+        self.window(node.se, row+h, col+h, out, row0, col0)
+
+    def centre(self, node : Node) -> Node:
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def centre_h(self, w : Node, e : Node) -> Node:
+        return self.join(w.ne, e.nw, w.se, e.sw)
+
+    def centre_v(self, n : Node, s : Node) -> Node:
+        return self.join(n.sw, n.se, s.nw, s.ne)
+
+    def life_4x4(self, node : Node) -> Node:
+        """
+        Carré central 2x2 d'un noeud de niveau 2 (4x4 cellules) après une génération
+        """
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        cells = ((nw.nw, nw.ne, ne.nw, ne.ne), (nw.sw, nw.se, ne.sw, ne.se),
+                 (sw.nw, sw.ne, se.nw, se.ne), (sw.sw, sw.se, se.sw, se.se))
+        def next_cell(i, j):
+            count = sum(cells[i+di][j+dj].population for di in (-1, 0, 1) for dj in (-1, 0, 1) if di != 0 or dj != 0)
+            return self.on if count == 3 or (count == 2 and cells[i][j].population) else self.off
+        return self.join(next_cell(1, 1), next_cell(1, 2), next_cell(2, 1), next_cell(2, 2))
+
+    def successor(self, node : Node, j : int) -> Node:
+        """
+        Carré central (niveau level-1) du noeud après 2^j générations (j est ramené à level-2 au plus)
+        """
+        if node.population == 0:
+            return node.nw
+        j = min(j, node.level-2)
+        if node.results is None:
+            node.results = {}
+        result = node.results.get(j)
+        if result is not None:
+            return result
+        if node.level == 2:
+            result = self.life_4x4(node)
+        else:
+            # Les neuf carrés de niveau level-1 qui se recouvrent de moitié
+            n00, n01, n02 = node.nw, self.centre_h(node.nw, node.ne), node.ne
+            n10, n11, n12 = self.centre_v(node.nw, node.sw), self.centre(node), self.centre_v(node.ne, node.se)
+            n20, n21, n22 = node.sw, self.centre_h(node.sw, node.se), node.se
+            if j == node.level-2:
+                # Pleine vitesse : 2^(level-3) générations dans chacun des neuf carrés, puis autant dans les quatre suivants
+                c = [self.successor(n, j-1) for n in (n00, n01, n02, n10, n11, n12, n20, n21, n22)]
+                jj = j-1
+            else:
+                # Pas plus petit : les neuf carrés sont seulement recentrés, les 2^j générations sont faites ensuite
+                c = [self.centre(n) for n in (n00, n01, n02, n10, n11, n12, n20, n21, n22)]
+                jj = j
+            result = self.join(self.successor(self.join(c[0], c[1], c[3], c[4]), jj),
+                               self.successor(self.join(c[1], c[2], c[4], c[5]), jj),
+                               self.successor(self.join(c[3], c[4], c[6], c[7]), jj),
+                               self.successor(self.join(c[4], c[5], c[7], c[8]), jj))
+        node.results[j] = result
+        return result
+
+    def collect(self, roots):
+        """
+        Politique d'éviction : si la table dépasse max_nodes noeuds, on ne garde que les noeuds atteignables depuis
+        roots (et les noeuds vides) et on oublie tous les résultats mémorisés
+        """
+        if len(self.table) <= self.max_nodes:
+            return
+        table = {}
+        stack = list(roots) + self.empty[1:]
+        while len(stack) > 0:
+            node = stack.pop()
+            key = (id(node.nw), id(node.ne), id(node.sw), id(node.se))
+            if node.level == 0 or key in table:
+                continue
+            node.results = None
+            table[key] = node
+            stack.extend((node.nw, node.ne, node.sw, node.se))
+        self.table = table
+
+
+class GrilleHashLife:
+    """
+    Univers HashLife présentant la même interface que la Grille de game_of_life.py pour App.draw :
+        - dimensions est un tuple (nombre lignes, nombre colonnes) de la fenêtre affichée
+        - cells contient la fenêtre affichée, encadrée d'une ligne fantôme (vide) en haut et en bas
+        - step_log2 : chaque appel à compute_next_iteration avance de 2^step_log2 générations
+        - universe : "plan" (plan infini) ou "tore" (tore de 2^n x 2^n cellules)
+    """
+    def __init__(self, dim, init_pattern, step_log2 : int = 0, universe : str = "plan", max_nodes : int = 500_000,
+                 color_life=pg.Color("black"), color_dead=pg.Color("white")):
+        self.life = HashLife(max_nodes)
+        self.step_log2 = step_log2
+        self.universe = universe
+        self.generation = 0
+        # Le motif est placé dans le plus petit carré de côté 2^n (n >= 2) contenant la grille
+        level = max(2, (max(dim)-1).bit_length())
+        if universe == "tore":
+            dim = (1 << level, 1 << level)
+        self.dimensions = dim
+        cells = np.zeros((1 << level, 1 << level), dtype=np.uint8)
+        for i, j in init_pattern:
+            cells[i, j] = 1
+        self.root = self.life.from_cells(cells)
+        self.origin = (0, 0) # Cellule du coin nw de self.root
+        self.cells = np.zeros((dim[0]+2, dim[1]), dtype=np.uint8)
+        self.update_window()
+        self.col_life = color_life
+        self.col_dead = color_dead
+
+    def update_window(self):
+        self.cells[1:-1, :] = 0
+        self.life.window(self.root, self.origin[0], self.origin[1], self.cells[1:-1, :], 0, 0)
+
+    def expand(self):
+        """
+        Agrandit l'univers (plan) d'un niveau en gardant le motif au centre
+        """
+        life, root = self.life, self.root
+        e = life.empty_node(root.level-1)
+        self.root = life.join(life.join(e, e, e, root.nw), life.join(e, e, root.ne, e),
+                              life.join(e, root.sw, e, e), life.join(root.se, e, e, e))
+        h = 1 << (root.level-1)
+        self.origin = (self.origin[0]-h, self.origin[1]-h)
+
+    def is_centred(self) -> bool:
+        """
+        Le motif est-il contenu dans le carré central (de côté moitié) de l'univers ?
+        """
+        nw, ne, sw, se = self.root.nw, self.root.ne, self.root.sw, self.root.se
+        return (nw.population == nw.se.population and ne.population == ne.sw.population and
+                sw.population == sw.ne.population and se.population == se.nw.population)
+
+    def step(self, j : int):
+        """
+        Avance l'univers de 2^j générations
+        """
+        life = self.life
+        if self.universe == "tore":
+            # Le tore, pavé 2x2 fois, est un motif périodique du plan : le carré central du pavage après 2^j
+            # générations (j <= n-1) est le tore décalé d'un demi-côté, qu'on remet en place en échangeant ses quarts
+            j = min(j, self.root.level-1)
+            r = life.successor(life.join(self.root, self.root, self.root, self.root), j)
+            self.root = life.join(r.se, r.sw, r.ne, r.nw)
+        else:
+            # Le motif doit rester dans l'univers pendant les 2^j générations : on le recentre, puis on agrandit
+            # encore une fois (le motif s'étend d'au plus une cellule par génération)
+            while self.root.level < j+2 or not self.is_centred():
+                self.expand()
+            self.expand()
+            h = 1 << (self.root.level-2)
+            self.root = life.successor(self.root, j)
+            self.origin = (self.origin[0]+h, self.origin[1]+h)
+        self.generation += 1 << j
+
+    def compute_next_iteration(self):
+        """
+        Avance de 2^step_log2 générations et renvoie les cellules de la fenêtre modifiées
+        """
+        previous = self.cells[1:-1, :].copy()
+        if self.universe == "tore" and self.step_log2 > self.root.level-1:
+            # Sur le tore, un pas est limité à 2^(n-1) générations : on en enchaîne plusieurs
+            for _ in range(1 << (self.step_log2-self.root.level+1)):
+                self.step(self.root.level-1)
+        else:
+            self.step(self.step_log2)
+        self.life.collect([self.root])
+        self.update_window()
+        return self.cells[1:-1, :] != previous
+
+
+class App:
+    """
+    Cette classe décrit la fenêtre affichant la grille à l'écran
+        - geometry est un tuple de deux entiers donnant le nombre de pixels verticaux et horizontaux (dans cet ordre)
+        - grid est la grille décrivant l'automate cellulaire (voir plus haut)
+    L'image mise à l'échelle de la grille et le quadrillage sont gardés d'un affichage à l'autre : seuls les
+    rectangles (par tuiles de dirty_tile x dirty_tile cellules) qui contiennent une cellule modifiée sont redessinés.
+    """
+    def __init__(self, geometry, grid, dirty_tile : int = 8):
+        self.grid = grid
+        # Calcul de la taille d'une cellule par rapport à la taille de la fenêtre et de la grille à afficher :
+        self.size_x = geometry[1]//grid.dimensions[1]
+        self.size_y = geometry[0]//grid.dimensions[0]
+        if self.size_x > 4 and self.size_y > 4 :
+            self.draw_color=pg.Color('lightgrey')
+        else:
+            self.draw_color=None
+        # Ajustement de la taille de la fenêtre pour bien fitter la dimension de la grille
+        self.width = grid.dimensions[1] * self.size_x
+        self.height= grid.dimensions[0] * self.size_y
+        # Création de la fenêtre à l'aide de tkinter
+        self.screen = pg.display.set_mode((self.width,self.height))
+        #
+        self.canvas_cells = []
+        self.colors = np.array([self.grid.col_dead[:-1], self.grid.col_life[:-1]], dtype=np.uint8)
+        self.dirty_tile = dirty_tile
+        # Image de la grille à l'échelle de la fenêtre, et quadrillage dessiné une fois pour toutes
+        # (sur fond transparent : couleur clé magenta)
+        self.surface = pg.Surface((self.width, self.height))
+        self.lines = None
+        if self.draw_color is not None:
+            self.lines = pg.Surface((self.width, self.height))
+            self.lines.fill(pg.Color('magenta'))
+            self.lines.set_colorkey(pg.Color('magenta'))
+            [pg.draw.line(self.lines, self.draw_color, (0,i*self.size_y), (self.width,i*self.size_y)) for i in range(self.grid.dimensions[0])]
+            [pg.draw.line(self.lines, self.draw_color, (j*self.size_x,0), (j*self.size_x,self.height)) for j in range(self.grid.dimensions[1])]
+        self.drawn_cells = None
+
+    def draw_cells(self, pixels : np.ndarray, cells : np.ndarray, i0 : int, i1 : int, j0 : int, j1 : int) -> pg.Rect:
+        """
+        Redessine dans pixels (pixels de self.surface) les cellules des lignes i0 à i1-1 et des colonnes j0 à j1-1,
+        et renvoie le rectangle de la fenêtre correspondant. La ligne 0 de la grille est en bas de la fenêtre.
+        """
+        nb_rows = self.grid.dimensions[0]
+        block = self.colors[cells[i0:i1, j0:j1].T[:, ::-1]]
+        block = np.repeat(np.repeat(block, self.size_x, axis=0), self.size_y, axis=1)
+        x, y = j0*self.size_x, (nb_rows-i1)*self.size_y
+        pixels[x:x+block.shape[0], y:y+block.shape[1]] = block
+        return pg.Rect(x, y, block.shape[0], block.shape[1])
+
+    def draw(self, diff_cells : np.ndarray = None):
+        """
+        Affiche la grille. diff_cells (même forme que grid.cells[1:-1,:]) indique les cellules modifiées depuis le
+        dernier affichage ; s'il n'est pas donné, on le calcule en comparant avec la grille affichée la dernière fois.
+        """
+        cells = self.grid.cells[1:-1,:]
+        dirty = None
+        if self.drawn_cells is not None:
+            if diff_cells is None:
+                diff_cells = cells != self.drawn_cells
+            # Tuiles contenant au moins une cellule modifiée
+            t = self.dirty_tile
+            nb_ti, nb_tj = -(-cells.shape[0]//t), -(-cells.shape[1]//t)
+            padded = np.zeros((nb_ti*t, nb_tj*t), dtype=bool)
+            padded[:cells.shape[0], :cells.shape[1]] = diff_cells
+            dirty = padded.reshape(nb_ti, t, nb_tj, t).any(axis=(1, 3))
+        if dirty is None or np.count_nonzero(dirty) > dirty.size//4:
+            # Premier affichage ou beaucoup de tuiles modifiées : on redessine toute l'image d'un coup
+            surface = pg.surfarray.make_surface(self.colors[cells.T[:, ::-1]])
+            pg.transform.scale(surface, (self.width, self.height), self.surface)
+            rects = [self.surface.get_rect()]
+        else:
+            pixels = pg.surfarray.pixels3d(self.surface)
+            rects = [self.draw_cells(pixels, cells, ti*t, min((ti+1)*t, cells.shape[0]), tj*t, min((tj+1)*t, cells.shape[1]))
+                     for ti, tj in zip(*np.nonzero(dirty))]
+            del pixels
+        self.drawn_cells = cells.copy()
+        for rect in rects:
+            self.screen.blit(self.surface, rect, rect)
+            if self.lines is not None:
+                self.screen.blit(self.lines, rect, rect)
+        pg.display.update(rects)
+
+
+if __name__ == '__main__':
+    import time
+    import sys
+
+    dico_patterns = { # Dimension et pattern dans un tuple
+        'blinker' : ((5,5),[(2,1),(2,2),(2,3)]),
+        'toad'    : ((6,6),[(2,2),(2,3),(2,4),(3,3),(3,4),(3,5)]),
+        "acorn"   : ((100,100), [(51,52),(52,54),(53,51),(53,52),(53,55),(53,56),(53,57)]),
+        "beacon"  : ((6,6), [(1,3),(1,4),(2,3),(2,4),(3,1),(3,2),(4,1),(4,2)]),
+        "boat" : ((5,5),[(1,1),(1,2),(2,1),(2,3),(3,2)]),
+        "glider": ((100,90),[(1,1),(2,2),(2,3),(3,1),(3,2)]),
+        "glider_gun": ((200,100),[(51,76),(52,74),(52,76),(53,64),(53,65),(53,72),(53,73),(53,86),(53,87),(54,63),(54,67),(54,72),(54,73),(54,86),(54,87),(55,52),(55,53),(55,62),(55,68),(55,72),(55,73),(56,52),(56,53),(56,62),(56,66),(56,68),(56,69),(56,74),(56,76),(57,62),(57,68),(57,76),(58,63),(58,67),(59,64),(59,65)]),
+        "space_ship": ((25,25),[(11,13),(11,14),(12,11),(12,12),(12,14),(12,15),(13,11),(13,12),(13,13),(13,14),(14,12),(14,13)]),
+        "die_hard" : ((100,100), [(51,57),(52,51),(52,52),(53,52),(53,56),(53,57),(53,58)]),
+        "pulsar": ((17,17),[(2,4),(2,5),(2,6),(7,4),(7,5),(7,6),(9,4),(9,5),(9,6),(14,4),(14,5),(14,6),(2,10),(2,11),(2,12),(7,10),(7,11),(7,12),(9,10),(9,11),(9,12),(14,10),(14,11),(14,12),(4,2),(5,2),(6,2),(4,7),(5,7),(6,7),(4,9),(5,9),(6,9),(4,14),(5,14),(6,14),(10,2),(11,2),(12,2),(10,7),(11,7),(12,7),(10,9),(11,9),(12,9),(10,14),(11,14),(12,14)]),
+        "floraison" : ((40,40), [(19,18),(19,19),(19,20),(20,17),(20,19),(20,21),(21,18),(21,19),(21,20)]),
+        "block_switch_engine" : ((400,400), [(201,202),(201,203),(202,202),(202,203),(211,203),(212,204),(212,202),(214,204),(214,201),(215,201),(215,202),(216,201)]),
+        "u" : ((200,200), [(101,101),(102,102),(103,102),(103,101),(104,103),(105,103),(105,102),(105,101),(105,105),(103,105),(102,105),(101,105),(101,104)]),
+        "flat" : ((200,400), [(80,200),(81,200),(82,200),(83,200),(84,200),(85,200),(86,200),(87,200), (89,200),(90,200),(91,200),(92,200),(93,200),(97,200),(98,200),(99,200),(106,200),(107,200),(108,200),(109,200),(110,200),(111,200),(112,200),(114,200),(115,200),(116,200),(117,200),(118,200)])
+    }
+    choice = 'glider'
+    if len(sys.argv) > 1 :
+        choice = sys.argv[1]
+    resx = 800
+    resy = 800
+    if len(sys.argv) > 3 :
+        resx = int(sys.argv[2])
+        resy = int(sys.argv[3])
+    # Nombre de générations par étape (2^step_log2) et univers ("plan" ou "tore")
+    step_log2 = 0
+    if len(sys.argv) > 4 :
+        step_log2 = int(sys.argv[4])
+    universe = "plan"
+    if len(sys.argv) > 5 :
+        universe = sys.argv[5]
+    print(f"Pattern initial choisi : {choice}")
+    print(f"resolution ecran : {resx,resy}")
+    print(f"generations par etape : 2^{step_log2}, univers : {universe}")
+    try:
+        init_pattern = dico_patterns[choice]
+    except KeyError:
+        print("No such pattern. Available ones are:", dico_patterns.keys())
+        exit(1)
+    pg.init()
+    grid = GrilleHashLife(*init_pattern, step_log2=step_log2, universe=universe)
+    appli = App((resx, resy), grid)
+    loop = True
+    while loop:
+        #time.sleep(0.1) # A régler ou commenter pour vitesse maxi
+        t1 = time.time()
+        diff = grid.compute_next_iteration()
+        t2 = time.time()
+        appli.draw(diff)
+        t3 = time.time()
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                loop = False
+                pg.quit()
+        print(f"Generation {grid.generation}, population {grid.root.population}, noeuds {len(grid.life.table)} : "
+              f"Temps calcul : {t2-t1:2.2e} secondes, Temps affichage : {t3-t2:2.2e} secondes", flush=True)
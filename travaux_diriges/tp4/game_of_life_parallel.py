@@ -83,13 +83,378 @@ class Grille:
         req1.Wait()
         req2.Wait()
 
+def pack_rows(cells : np.ndarray) -> np.ndarray:
+    """
+    Range les lignes de cellules (uint8, 0 ou 1) par paquets de 64 dans des mots uint64 : la cellule j d'une ligne
+    est le bit j%64 du mot j//64. Les bits au delà de la dernière colonne sont nuls.
+    """
+    nb_words = (cells.shape[1]+63)//64
+    bytes_ = np.packbits(cells, axis=1, bitorder='little')
+    padded = np.zeros((cells.shape[0], 8*nb_words), dtype=np.uint8)
+    padded[:, :bytes_.shape[1]] = bytes_
+    return padded.view('<u8').astype(np.uint64)
+
+def unpack_rows(words : np.ndarray, width : int) -> np.ndarray:
+    """
+    Opération inverse de pack_rows : renvoie les width premières cellules de chaque ligne en uint8
+    """
+    return np.unpackbits(np.ascontiguousarray(words, dtype='<u8').view(np.uint8), axis=1, bitorder='little')[:, :width]
+
+class GrilleBits(Grille):
+    """
+    Même grille torique que Grille, mais chaque ligne est rangée dans des mots de 64 bits (64 cellules par mot)
+    et la génération suivante est calculée sur des lignes entières par opérations logiques (additionneurs
+    bit à bit) au lieu de huit np.roll sur des octets. Les lignes fantômes échangées sont 8 fois plus petites.
+    La grille n'est jamais affichée telle quelle : le processus d'affichage reçoit les mots et les dépaquette (unpack_rows).
+    """
+    def __init__(self, rank : int, nbp : int, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+        super().__init__(rank, nbp, dim, init_pattern, color_life, color_dead)
+        if init_pattern is None:
+            self.cells = np.random.randint(2, size=(self.dimensions_loc[0]+2, dim[1]), dtype=np.uint8)
+        self.words = pack_rows(self.cells)
+        del self.cells
+        # Position du bit de la dernière colonne dans le dernier mot, et masque des bits utiles de ce mot
+        self.last_bit = np.uint64((dim[1]-1) % 64)
+        self.last_mask = np.uint64((1 << ((dim[1]-1) % 64 + 1)) - 1)
+
+    def shift_columns(self, x : np.ndarray):
+        """
+        Renvoie les lignes de x décalées d'une colonne (la cellule j reçoit la cellule j-1, puis j+1), sur le tore
+        """
+        one, high = np.uint64(1), np.uint64(63)
+        left  = (x << one) | (np.roll(x, 1, axis=1) >> high)
+        left[:, 0] |= (x[:, -1] >> self.last_bit) & one
+        right = (x >> one) | (np.roll(x, -1, axis=1) << high)
+        right[:, -1] |= (x[:, 0] & one) << self.last_bit
+        return left, right
+
+    def compute_next_iteration(self):
+        """
+        Calcule la prochaine génération de cellules en suivant les règles du jeu de la vie.
+        Renvoie les cellules modifiées sous forme de mots de bits (lignes fantômes exclues)
+        """
+        x = self.words
+        left, right = self.shift_columns(x)
+        # Somme (sur deux bits s0 + 2 s1) des trois cellules gauche, centre, droite de chaque ligne
+        s0 = left ^ x ^ right
+        s1 = (left & x) | (right & (left ^ x))
+        # Ligne de la cellule : seulement les voisines gauche et droite
+        m0 = (left ^ right)[1:-1]
+        m1 = (left & right)[1:-1]
+        u0, u1 = s0[:-2], s1[:-2] # Ligne du dessus
+        d0, d1 = s0[2:],  s1[2:]  # Ligne du dessous
+        # Nombre de voisines = bit0 + 2*(u1 + m1 + d1 + retenue), avec bit0 et retenue sommes des bits de poids 1
+        bit0  = u0 ^ m0 ^ d0
+        carry = (u0 & m0) | (d0 & (u0 ^ m0))
+        # Exactement un bit de poids 2 : 2 ou 3 voisines
+        one = (u1 ^ m1 ^ d1 ^ carry) & ~((u1 & m1) | (d1 & carry))
+        alive = x[1:-1]
+        next_words = one & (bit0 | alive)
+        next_words[:, -1] &= self.last_mask
+        diff_words = next_words ^ alive
+        self.words[1:-1] = next_words
+        return diff_words
+
+    def update_ghost_cells(self):
+        """
+        Met à jour les lignes fantômes (en mots de 64 cellules)
+        """
+        req1 = newCom.Irecv(self.words[-1,:], source = (newCom.rank+1)%newCom.size, tag=101)
+        req2 = newCom.Irecv(self.words[0,:], source = (newCom.rank+newCom.size-1)%newCom.size, tag=102)
+        newCom.Send(self.words[-2,:], dest = (newCom.rank+1)%newCom.size, tag=102)
+        newCom.Send(self.words[1,:], dest = (newCom.rank+newCom.size-1)%newCom.size, tag=101)
+        req1.Wait()
+        req2.Wait()
+
+class GrilleTuiles(Grille):
+    """
+    Même grille que Grille, mais découpée en tuiles de tile_size x tile_size cellules dont on ne recalcule que
+    celles qui peuvent changer : une tuile est active si l'une de ses cellules a changé à la génération précédente,
+    et seules les tuiles actives, leurs huit voisines et les tuiles du bord touchées par une ligne fantôme modifiée
+    sont recalculées. Les attributs nb_active et nb_computed donnent le nombre de tuiles actives et recalculées.
+    """
+    def __init__(self, rank : int, nbp : int, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), tile_size : int = 16):
+        super().__init__(rank, nbp, dim, init_pattern, color_life, color_dead)
+        if init_pattern is None:
+            self.cells = np.random.randint(2, size=(self.dimensions_loc[0]+2, dim[1]), dtype=np.uint8)
+        self.tile_size = tile_size
+        nb_rows = (self.dimensions_loc[0]+tile_size-1)//tile_size
+        nb_cols = (dim[1]+tile_size-1)//tile_size
+        # Indices des lignes et des colonnes de chaque tuile, encadrées d'une ligne et d'une colonne de chaque côté
+        # (lignes fantômes, colonnes sur le tore). Les tuiles du bord sont complétées par des cellules non valides.
+        offsets = np.arange(-1, tile_size+1)
+        self.row_index = np.minimum(1 + tile_size*np.arange(nb_rows)[:, np.newaxis] + offsets, self.dimensions_loc[0]+1)
+        self.col_index = (tile_size*np.arange(nb_cols)[:, np.newaxis] + offsets) % dim[1]
+        self.row_valid = tile_size*np.arange(nb_rows)[:, np.newaxis] + offsets[1:-1] < self.dimensions_loc[0]
+        self.col_valid = tile_size*np.arange(nb_cols)[:, np.newaxis] + offsets[1:-1] < dim[1]
+        # Au départ toutes les tuiles sont actives
+        self.active = np.ones((nb_rows, nb_cols), dtype=bool)
+        self.ghosts = self.cells[[0, -1], :].copy()
+        self.nb_active = self.active.size
+        self.nb_computed = 0
+
+    def tiles_to_compute(self):
+        """
+        Tuiles actives et leurs voisines, plus les tuiles du bord voisines d'une cellule fantôme modifiée
+        """
+        compute = self.active.copy()
+        compute[1:]  |= self.active[:-1]
+        compute[:-1] |= self.active[1:]
+        compute |= np.roll(compute, 1, axis=1) | np.roll(compute, -1, axis=1)
+        width = self.dimensions[1]
+        for row, ghost, previous in ((0, self.cells[0], self.ghosts[0]), (-1, self.cells[-1], self.ghosts[1])):
+            changed = np.flatnonzero(ghost != previous)
+            for shift in (-1, 0, 1):
+                compute[row, ((changed+shift) % width)//self.tile_size] = True
+        return compute
+
+    def compute_next_iteration(self):
+        """
+        Calcule la prochaine génération de cellules des tuiles qui peuvent changer, toutes à la fois
+        """
+        cells = self.cells
+        ts = self.tile_size
+        ti, tj = np.nonzero(self.tiles_to_compute())
+        self.ghosts[...] = cells[[0, -1], :]
+        rows, cols = self.row_index[ti][:, :, np.newaxis], self.col_index[tj][:, np.newaxis, :]
+        block = cells[rows, cols]
+        neighbours_count = sum(block[:, 1+i:ts+1+i, 1+j:ts+1+j] for i in (-1, 0, 1) for j in (-1, 0, 1) if (i != 0 or j != 0))
+        tiles = block[:, 1:-1, 1:-1]
+        next_tiles = (neighbours_count == 3) | (tiles & (neighbours_count == 2))
+        valid = self.row_valid[ti][:, :, np.newaxis] & self.col_valid[tj][:, np.newaxis, :]
+        diff_tiles = (next_tiles != tiles) & valid
+        self.active[...] = False
+        self.active[ti, tj] = diff_tiles.any(axis=(1, 2))
+        # Les tuiles sont recopiées une fois toutes calculées : leurs voisines ont lu l'ancienne génération
+        rows = np.broadcast_to(rows[:, 1:-1, :], valid.shape)[valid]
+        cols = np.broadcast_to(cols[:, :, 1:-1], valid.shape)[valid]
+        cells[rows, cols] = next_tiles[valid]
+        diff_cells = np.zeros(cells.shape, dtype=bool)
+        diff_cells[rows, cols] = diff_tiles[valid]
+        self.nb_active = np.count_nonzero(self.active)
+        self.nb_computed = ti.size
+        return diff_cells
+
+class GrilleBlocs(Grille):
+    """
+    Grille torique découpée en blocs 2D sur une topologie cartésienne périodique (MPI.Cart) : chaque processus
+    possède un bloc de lignes et de colonnes, encadré d'une ligne et d'une colonne fantômes de chaque côté.
+    Le volume échangé par processus décroît comme la racine du nombre de processus, au lieu de rester constant
+    avec des bandes de lignes.
+    En entrée, comm est le communicateur des processus de calcul (les autres paramètres sont ceux de Grille).
+    """
+    def __init__(self, comm, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+        self.comm = comm.Create_cart(MPI.Compute_dims(comm.size, 2), periods=(True, True), reorder=False)
+        nb_blocks = self.comm.Get_topo()[0]
+        coords = self.comm.Get_coords(self.comm.rank)
+        self.dimensions = dim
+        self.dimensions_loc = tuple(dim[d]//nb_blocks[d] + (1 if coords[d] < dim[d]%nb_blocks[d] else 0) for d in (0, 1))
+        self.start_loc, self.start_col = (coords[d] * self.dimensions_loc[d] + (dim[d]%nb_blocks[d] if coords[d] >= dim[d]%nb_blocks[d] else 0)
+                                          for d in (0, 1))
+        rows, cols = self.dimensions_loc
+        if init_pattern is not None:
+            self.cells = np.zeros((rows+2, cols+2), dtype=np.uint8)
+            cells = [(v[0]-self.start_loc+1, v[1]-self.start_col+1) for v in init_pattern
+                     if self.start_loc <= v[0] < self.start_loc+rows and self.start_col <= v[1] < self.start_col+cols]
+            if len(cells) > 0:
+                self.cells[tuple(zip(*cells))] = 1
+        else:
+            self.cells = np.random.randint(2, size=(rows+2, cols+2), dtype=np.uint8)
+        self.col_life = color_life
+        self.col_dead = color_dead
+        # Une colonne du bloc (lignes intérieures) : rows octets espacés d'une ligne complète
+        self.column_type = MPI.UNSIGNED_CHAR.Create_vector(rows, 1, cols+2).Commit()
+        self.up, self.down = self.comm.Shift(0, 1)
+        self.left, self.right = self.comm.Shift(1, 1)
+
+    def compute_next_iteration(self):
+        """
+        Calcule la prochaine génération de cellules (le calcul de Grille, cellules gardées en uint8)
+        """
+        diff_cells = super().compute_next_iteration()
+        self.cells = self.cells.view(np.uint8)
+        return diff_cells
+
+    def update_ghost_cells(self):
+        """
+        Met à jour les cellules fantômes : d'abord les colonnes (type dérivé), puis les lignes complètes,
+        colonnes fantômes comprises, ce qui transmet aussi les coins aux voisins en diagonale
+        """
+        comm, cells = self.comm, self.cells
+        width = cells.shape[1]
+        flat = cells.reshape(-1)
+        def column(j):
+            return [flat[width+j:], 1, self.column_type]
+        req1 = comm.Irecv(column(width-1), source = self.right, tag=103)
+        req2 = comm.Irecv(column(0), source = self.left, tag=104)
+        comm.Send(column(width-2), dest = self.right, tag=104)
+        comm.Send(column(1), dest = self.left, tag=103)
+        MPI.Request.Waitall([req1, req2])
+        req1 = comm.Irecv(cells[-1,:], source = self.down, tag=101)
+        req2 = comm.Irecv(cells[0,:], source = self.up, tag=102)
+        comm.Send(cells[-2,:], dest = self.down, tag=102)
+        comm.Send(cells[1,:], dest = self.up, tag=101)
+        req1.Wait()
+        req2.Wait()
+
+class GrilleHalo(Grille):
+    """
+    Même grille en bandes de lignes que Grille, mais avec halo lignes fantômes de chaque côté : on échange
+    halo lignes une seule fois toutes les halo générations, puis on avance localement sur une zone valide qui
+    perd une ligne de chaque côté à chaque génération. On envoie halo fois moins de messages, au prix du calcul
+    redondant des lignes fantômes. Le halo est limité au nombre de lignes du plus petit bloc.
+    """
+    def __init__(self, rank : int, nbp : int, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), halo : int = 4):
+        super().__init__(rank, nbp, dim, init_pattern, color_life, color_dead)
+        self.halo = max(1, min(halo, dim[0]//nbp))
+        cells = np.zeros((self.dimensions_loc[0]+2*self.halo, dim[1]), dtype=np.uint8)
+        if init_pattern is None:
+            cells[self.halo:-self.halo] = np.random.randint(2, size=self.dimensions_loc, dtype=np.uint8)
+        else:
+            cells[self.halo:-self.halo] = self.cells[1:-1]
+        self.cells = cells
+        # Nombre de générations calculées depuis le dernier échange (le premier appel à update_ghost_cells échange)
+        self.steps = self.halo
+
+    def compute_next_iteration(self):
+        """
+        Calcule la prochaine génération des cellules encore valides : après s générations depuis l'échange,
+        les s premières et dernières lignes du tableau ne sont plus à jour
+        """
+        s = self.steps
+        n = self.cells.shape[0]
+        cells = self.cells[s:n-s]
+        # Somme de chaque ligne sur trois colonnes (tore), puis sur trois lignes, moins la cellule elle-même
+        rows = cells + np.roll(cells, 1, 1) + np.roll(cells, -1, 1)
+        neighbours_count = rows[:-2] + rows[1:-1] + rows[2:] - cells[1:-1]
+        next_cells = (neighbours_count == 3) | (cells[1:-1] & (neighbours_count == 2))
+        diff_cells = np.zeros(self.cells.shape, dtype=bool)
+        diff_cells[s+1:n-s-1] = next_cells != cells[1:-1]
+        self.cells[s+1:n-s-1] = next_cells
+        self.steps += 1
+        return diff_cells
+
+    def update_ghost_cells(self):
+        """
+        Met à jour les halo lignes fantômes de chaque côté, une fois toutes les halo générations
+        """
+        if self.steps < self.halo:
+            return
+        k = self.halo
+        req1 = newCom.Irecv(self.cells[-k:,:], source = (newCom.rank+1)%newCom.size, tag=101)
+        req2 = newCom.Irecv(self.cells[:k,:], source = (newCom.rank+newCom.size-1)%newCom.size, tag=102)
+        newCom.Send(self.cells[-2*k:-k,:], dest = (newCom.rank+1)%newCom.size, tag=102)
+        newCom.Send(self.cells[k:2*k,:], dest = (newCom.rank+newCom.size-1)%newCom.size, tag=101)
+        req1.Wait()
+        req2.Wait()
+        self.steps = 0
+
+class GrilleRecouvrement(Grille):
+    """
+    Même grille en bandes de lignes que Grille, mais l'échange des lignes fantômes est recouvert par le calcul :
+    on démarre l'échange, on calcule les lignes intérieures (qui n'en dépendent pas), puis on attend la fin de
+    l'échange pour calculer les deux lignes du bord. La génération suivante est calculée dans un second tableau ;
+    les requêtes persistantes (Send_init/Recv_init) sont créées une fois pour chacun des deux tableaux.
+    """
+    def __init__(self, rank : int, nbp : int, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+        super().__init__(rank, nbp, dim, init_pattern, color_life, color_dead)
+        if init_pattern is None:
+            self.cells = np.random.randint(2, size=(self.dimensions_loc[0]+2, dim[1]), dtype=np.uint8)
+        self.buffers = (self.cells, np.zeros_like(self.cells))
+        self.current = 0
+        down, up = (newCom.rank+1)%newCom.size, (newCom.rank+newCom.size-1)%newCom.size
+        self.requests = [[newCom.Recv_init(cells[-1,:], source = down, tag=101),
+                          newCom.Recv_init(cells[0,:], source = up, tag=102),
+                          newCom.Send_init(cells[-2,:], dest = down, tag=102),
+                          newCom.Send_init(cells[1,:], dest = up, tag=101)] for cells in self.buffers]
+
+    @staticmethod
+    def next_rows(cells : np.ndarray, next_cells : np.ndarray, first : int, last : int):
+        """
+        Calcule dans next_cells les lignes first à last-1 de la génération suivante de cells
+        """
+        rows = cells[first-1:last+1]
+        # Somme de chaque ligne sur trois colonnes (tore), puis sur trois lignes, moins la cellule elle-même
+        sums = rows + np.roll(rows, 1, 1) + np.roll(rows, -1, 1)
+        neighbours_count = sums[:-2] + sums[1:-1] + sums[2:] - rows[1:-1]
+        next_cells[first:last] = (neighbours_count == 3) | (rows[1:-1] & (neighbours_count == 2))
+
+    def compute_next_iteration(self):
+        """
+        Échange les lignes fantômes et calcule la prochaine génération de cellules, en recouvrant l'un par l'autre
+        """
+        cells, next_cells = self.buffers[self.current], self.buffers[1-self.current]
+        requests = self.requests[self.current]
+        MPI.Prequest.Startall(requests)
+        nb_rows = self.dimensions_loc[0]
+        self.next_rows(cells, next_cells, 2, nb_rows)
+        MPI.Request.Waitall(requests)
+        self.next_rows(cells, next_cells, 1, 2)
+        self.next_rows(cells, next_cells, nb_rows, nb_rows+1)
+        diff_cells = next_cells != cells
+        diff_cells[[0, -1], :] = False
+        self.current = 1-self.current
+        self.cells = next_cells
+        return diff_cells
+
+    def update_ghost_cells(self):
+        """
+        Rien à faire : les lignes fantômes sont échangées au début de compute_next_iteration
+        """
+        pass
+
+FRAME_KEY, FRAME_DELTA, FRAME_END = 0, 1, 2
+
+def encode_frame(cells : np.ndarray, previous : np.ndarray = None) -> np.ndarray:
+    """
+    Code une image de la grille (cellules uint8, 0 ou 1) en message d'octets pour le processus d'affichage :
+    un entier de 4 octets donnant le type d'image, puis
+        - FRAME_DELTA : les bornes (uint32) des suites de cellules qui ont changé depuis l'image previous
+          (codage par plages du XOR des deux images)
+        - FRAME_KEY   : toutes les cellules, 8 par octet, si previous est absent ou si le delta est plus gros
+    """
+    kind, payload = FRAME_KEY, None
+    if previous is not None:
+        changed = np.concatenate(([False], (cells != previous).ravel(), [False]))
+        bounds = np.flatnonzero(changed[1:] != changed[:-1]).astype('<u4')
+        if 4*bounds.size < cells.size//8:
+            kind, payload = FRAME_DELTA, bounds.view(np.uint8)
+    if payload is None:
+        payload = np.packbits(cells.ravel())
+    return np.concatenate((np.array([kind], dtype='<u4').view(np.uint8), payload))
+
+def decode_frame(message : np.ndarray, cells : np.ndarray, diff : np.ndarray = None) -> int:
+    """
+    Applique à cells (tableau contigu uint8) l'image codée par encode_frame et renvoie son type.
+    Si diff (tableau contigu bool de même forme) est donné, on y ajoute les cellules modifiées par l'image.
+    """
+    kind = int(message[:4].view('<u4')[0])
+    flat = cells.reshape(-1)
+    if kind == FRAME_KEY:
+        key = np.unpackbits(message[4:], count=flat.size)
+        if diff is not None:
+            diff.reshape(-1)[:] |= key != flat
+        flat[:] = key
+    elif kind == FRAME_DELTA:
+        bounds = message[4:].view('<u4')
+        toggle = np.zeros(flat.size+1, dtype=np.int8)
+        toggle[bounds[0::2]] = 1
+        toggle[bounds[1::2]] = -1
+        toggle = np.cumsum(toggle[:-1], dtype=np.int8).astype(np.uint8)
+        flat ^= toggle
+        if diff is not None:
+            diff.reshape(-1)[:] |= toggle != 0
+    return kind
+
 class App:
     """
     Cette classe décrit la fenêtre affichant la grille à l'écran
         - geometry est un tuple de deux entiers donnant le nombre de pixels verticaux et horizontaux (dans cet ordre)
         - grid est la grille décrivant l'automate cellulaire (voir plus haut)
+    L'image mise à l'échelle de la grille et le quadrillage sont gardés d'un affichage à l'autre : seuls les
+    rectangles (par tuiles de dirty_tile x dirty_tile cellules) qui contiennent une cellule modifiée sont redessinés.
     """
-    def __init__(self, geometry, grid):
+    def __init__(self, geometry, grid, dirty_tile : int = 8):
         self.grid = grid
         # Calcul de la taille d'une cellule par rapport à la taille de la fenêtre et de la grille à afficher :
         self.size_x = geometry[1]//grid.dimensions[1]
@@ -105,17 +470,64 @@ class App:
         self.screen = pg.display.set_mode((self.width,self.height))
         #
         self.canvas_cells = []
-        self.colors = np.array([self.grid.col_dead[:-1], self.grid.col_life[:-1]])
+        self.colors = np.array([self.grid.col_dead[:-1], self.grid.col_life[:-1]], dtype=np.uint8)
+        self.dirty_tile = dirty_tile
+        # Image de la grille à l'échelle de la fenêtre, et quadrillage dessiné une fois pour toutes
+        # (sur fond transparent : couleur clé magenta)
+        self.surface = pg.Surface((self.width, self.height))
+        self.lines = None
+        if self.draw_color is not None:
+            self.lines = pg.Surface((self.width, self.height))
+            self.lines.fill(pg.Color('magenta'))
+            self.lines.set_colorkey(pg.Color('magenta'))
+            [pg.draw.line(self.lines, self.draw_color, (0,i*self.size_y), (self.width,i*self.size_y)) for i in range(self.grid.dimensions[0])]
+            [pg.draw.line(self.lines, self.draw_color, (j*self.size_x,0), (j*self.size_x,self.height)) for j in range(self.grid.dimensions[1])]
+        self.drawn_cells = None
+
+    def draw_cells(self, pixels : np.ndarray, cells : np.ndarray, i0 : int, i1 : int, j0 : int, j1 : int) -> pg.Rect:
+        """
+        Redessine dans pixels (pixels de self.surface) les cellules des lignes i0 à i1-1 et des colonnes j0 à j1-1,
+        et renvoie le rectangle de la fenêtre correspondant. La ligne 0 de la grille est en bas de la fenêtre.
+        """
+        nb_rows = self.grid.dimensions[0]
+        block = self.colors[cells[i0:i1, j0:j1].T[:, ::-1]]
+        block = np.repeat(np.repeat(block, self.size_x, axis=0), self.size_y, axis=1)
+        x, y = j0*self.size_x, (nb_rows-i1)*self.size_y
+        pixels[x:x+block.shape[0], y:y+block.shape[1]] = block
+        return pg.Rect(x, y, block.shape[0], block.shape[1])
 
-    def draw(self):
-        surface = pg.surfarray.make_surface(self.colors[self.grid.cells[1:-1,:].T])
-        surface = pg.transform.flip(surface, False, True)
-        surface = pg.transform.scale(surface, (self.width, self.height))
-        self.screen.blit(surface, (0,0))
-        if (self.draw_color is not None):
-            [pg.draw.line(self.screen, self.draw_color, (0,i*self.size_y), (self.width,i*self.size_y)) for i in range(self.grid.dimensions[0])]
-            [pg.draw.line(self.screen, self.draw_color, (j*self.size_x,0), (j*self.size_x,self.height)) for j in range(self.grid.dimensions[1])]
-        pg.display.update()
+    def draw(self, diff_cells : np.ndarray = None):
+        """
+        Affiche la grille. diff_cells (même forme que grid.cells[1:-1,:]) indique les cellules modifiées depuis le
+        dernier affichage ; s'il n'est pas donné, on le calcule en comparant avec la grille affichée la dernière fois.
+        """
+        cells = self.grid.cells[1:-1,:]
+        dirty = None
+        if self.drawn_cells is not None:
+            if diff_cells is None:
+                diff_cells = cells != self.drawn_cells
+            # Tuiles contenant au moins une cellule modifiée
+            t = self.dirty_tile
+            nb_ti, nb_tj = -(-cells.shape[0]//t), -(-cells.shape[1]//t)
+            padded = np.zeros((nb_ti*t, nb_tj*t), dtype=bool)
+            padded[:cells.shape[0], :cells.shape[1]] = diff_cells
+            dirty = padded.reshape(nb_ti, t, nb_tj, t).any(axis=(1, 3))
+        if dirty is None or np.count_nonzero(dirty) > dirty.size//4:
+            # Premier affichage ou beaucoup de tuiles modifiées : on redessine toute l'image d'un coup
+            surface = pg.surfarray.make_surface(self.colors[cells.T[:, ::-1]])
+            pg.transform.scale(surface, (self.width, self.height), self.surface)
+            rects = [self.surface.get_rect()]
+        else:
+            pixels = pg.surfarray.pixels3d(self.surface)
+            rects = [self.draw_cells(pixels, cells, ti*t, min((ti+1)*t, cells.shape[0]), tj*t, min((tj+1)*t, cells.shape[1]))
+                     for ti, tj in zip(*np.nonzero(dirty))]
+            del pixels
+        self.drawn_cells = cells.copy()
+        for rect in rects:
+            self.screen.blit(self.surface, rect, rect)
+            if self.lines is not None:
+                self.screen.blit(self.lines, rect, rect)
+        pg.display.update(rects)
 
 
 if __name__ == '__main__':
@@ -146,40 +558,110 @@ if __name__ == '__main__':
     if len(sys.argv) > 3 :
         resx = int(sys.argv[2])
         resy = int(sys.argv[3])
+    # Moteur de calcul des processus de calcul : "octets" (Grille, par défaut), "bits" (GrilleBits, 64 cellules par mot),
+    # "tuiles" (GrilleTuiles, seules les tuiles qui peuvent changer sont recalculées), "blocs" (GrilleBlocs,
+    # découpage en blocs 2D au lieu de bandes de lignes), "halo" (GrilleHalo, halo_depth lignes fantômes
+    # échangées toutes les halo_depth générations) ou "recouvrement" (GrilleRecouvrement, échange des lignes
+    # fantômes recouvert par le calcul des lignes intérieures)
+    engine = 'octets'
+    if len(sys.argv) > 4 :
+        engine = sys.argv[4]
+    halo_depth = 4
+    if len(sys.argv) > 5 :
+        halo_depth = int(sys.argv[5])
     print(f"Pattern initial choisi : {choice}")
     print(f"resolution ecran : {resx,resy}")
+    print(f"moteur de calcul : {engine}")
     try:
         init_pattern = dico_patterns[choice]
     except KeyError:
         print("No such pattern. Available ones are:", dico_patterns.keys())
         exit(1)
+    # Intervalle minimal (en secondes) entre deux images envoyées au processus d'affichage
+    frame_interval = 0.04
+    TAG_FRAME = 201
     if rank == 0:
         pg.init()
         grid = Grille(0, 1, *init_pattern)
         appli = App((resx, resy), grid)
+        status = MPI.Status()
+        # Cellules modifiées depuis le dernier affichage, déduites des images reçues : les diff_cells des processus
+        # de calcul ne couvrent qu'une génération, alors que les générations entre deux images ne sont pas envoyées
+        diff = np.zeros(grid.cells[1:-1,:].shape, dtype=bool)
         loop = True
         while loop:
-            globCom.send(1, dest=1)
-            appli.grid.cells[1:-1,:] = globCom.recv(source=1)
-            t2 = time.time()
-            appli.draw()
-            t3 = time.time()
+            # On applique toutes les images arrivées (les deltas s'enchaînent) et on n'affiche que la dernière
+            nb_frames = 0
+            while globCom.Iprobe(source=1, tag=TAG_FRAME, status=status):
+                message = np.empty(status.Get_count(MPI.BYTE), dtype=np.uint8)
+                globCom.Recv(message, source=1, tag=TAG_FRAME)
+                decode_frame(message, appli.grid.cells[1:-1,:], diff)
+                nb_frames += 1
+            if nb_frames == 0:
+                time.sleep(0.001)
+            else:
+                t2 = time.time()
+                appli.draw(diff)
+                diff[...] = False
+                t3 = time.time()
+                print(f"Temps affichage : {t3-t2:2.2e} secondes ({nb_frames} images reçues)", flush=True)
             for event in pg.event.get():
                 if event.type == pg.QUIT:
                     loop = False
                     pg.quit()
                     globCom.send(-1,dest=1)
-            print(f"Temps affichage : {t3-t2:2.2e} secondes", flush=True)
+        # Les images encore en route sont reçues jusqu'au message de fin
+        while True:
+            globCom.Probe(source=1, tag=TAG_FRAME, status=status)
+            message = np.empty(status.Get_count(MPI.BYTE), dtype=np.uint8)
+            globCom.Recv(message, source=1, tag=TAG_FRAME)
+            if decode_frame(message, grid.cells[1:-1,:]) == FRAME_END:
+                break
     else:
-        grid = Grille(newCom.rank, newCom.size, *init_pattern)
+        if engine == 'bits':
+            grid = GrilleBits(newCom.rank, newCom.size, *init_pattern)
+            cells = grid.words
+            print(f"rank loc : {newCom.rank}, cells locales : \n{unpack_rows(cells, grid.dimensions[1]).T}")
+        elif engine == 'blocs':
+            grid = GrilleBlocs(newCom, *init_pattern)
+            cells = grid.cells
+            print(f"rank loc : {newCom.rank}, bloc {grid.comm.Get_coords(grid.comm.rank)}, cells locales : \n{cells[1:-1,1:-1].T}")
+        elif engine == 'halo':
+            grid = GrilleHalo(newCom.rank, newCom.size, *init_pattern, halo=halo_depth)
+            cells = grid.cells
+            print(f"rank loc : {newCom.rank}, halo : {grid.halo}, cells locales : \n{cells.T}")
+        elif engine == 'recouvrement':
+            grid = GrilleRecouvrement(newCom.rank, newCom.size, *init_pattern)
+            cells = grid.cells
+            print(f"rank loc : {newCom.rank}, cells locales : \n{cells.T}")
+        else:
+            grid = GrilleTuiles(newCom.rank, newCom.size, *init_pattern) if engine == 'tuiles' else Grille(newCom.rank, newCom.size, *init_pattern)
+            cells = grid.cells
+            print(f"rank loc : {newCom.rank}, cells locales : \n{cells.T}")
         grid.update_ghost_cells()
-        print(f"rank loc : {newCom.rank}, cells locales : \n{grid.cells.T}")
+        # Nombre de lignes fantômes de chaque côté des lignes locales
+        k = grid.halo if engine == 'halo' else 1
 
+        # Le rassemblement porte sur les mots de bits avec le moteur "bits" (8 fois moins d'octets)
         grid_glob = None
         if newCom.rank == 0:
-            grid_glob = np.zeros(init_pattern[0], dtype=np.uint8)
-        sendcounts = np.array(newCom.gather(grid.cells[1:-1,:].size, root=0))
+            grid_glob = np.zeros((init_pattern[0][0], cells.shape[1] if engine != 'blocs' else init_pattern[0][1]), dtype=cells.dtype)
+        if engine == 'blocs':
+            # Les blocs sont rassemblés les uns après les autres, puis remis à leur place dans grid_glob
+            blocks = newCom.gather((grid.start_loc, grid.start_col, *grid.dimensions_loc), root=0)
+            sendcounts = np.array([r*c for _, _, r, c in blocks]) if newCom.rank == 0 else None
+            recv_blocks = np.empty(grid_glob.size, dtype=np.uint8) if newCom.rank == 0 else None
+        else:
+            sendcounts = np.array(newCom.gather(cells[k:-k,:].size, root=0))
 
+        # Le processus de calcul 0 décide, à chaque génération, de l'action de la génération suivante
+        # (0 : rien, 1 : envoyer une image, -1 : arrêter) et la diffuse par un Ibcast qui a toute une génération
+        # pour aboutir. Une image n'est envoyée que si frame_interval s'est écoulé et si l'envoi précédent est terminé.
+        action = np.zeros(1, dtype=np.int8)
+        next_action = np.ones(1, dtype=np.int8)
+        bcast = newCom.Ibcast(next_action, root=0)
+        frame_request, frame, previous_frame = None, None, None
+        last_frame = time.time()
         loop = True
         while loop:
             #time.sleep(0.1) # A régler ou commenter pour vitesse maxi
@@ -187,13 +669,43 @@ if __name__ == '__main__':
             diff = grid.compute_next_iteration()
             grid.update_ghost_cells()
             t2 = time.time()
-            newCom.Gatherv(grid.cells[1:-1,:], [grid_glob, sendcounts], root=0)
+            bcast.Wait()
+            action[0] = next_action[0]
             if newCom.rank == 0:
-                if (globCom.Iprobe(source=0)):
-                    a = globCom.recv(source=0)
-                    if a==-1:
-                        loop = False
-                    else:
-                        globCom.send(grid_glob, dest=0)
-            print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes", flush=True)
-
+                if action[0] == 1:
+                    last_frame = time.time()
+                stop = globCom.Iprobe(source=0)
+                if stop:
+                    globCom.recv(source=0)
+                frame_done = frame_request is None or frame_request.Test()
+                next_action[0] = -1 if stop else (1 if frame_done and time.time()-last_frame >= frame_interval else 0)
+            bcast = newCom.Ibcast(next_action, root=0)
+            if action[0] == -1:
+                loop = False
+            if action[0] == 1:
+                if engine == 'blocs':
+                    newCom.Gatherv(np.ascontiguousarray(grid.cells[1:-1,1:-1]), [recv_blocks, sendcounts], root=0)
+                    if newCom.rank == 0:
+                        offset = 0
+                        for i0, j0, r, c in blocks:
+                            grid_glob[i0:i0+r, j0:j0+c] = recv_blocks[offset:offset+r*c].reshape(r, c)
+                            offset += r*c
+                else:
+                    cells = grid.words if engine == 'bits' else grid.cells
+                    newCom.Gatherv(cells[k:-k,:], [grid_glob, sendcounts], root=0)
+                if newCom.rank == 0:
+                    frame_cells = unpack_rows(grid_glob, init_pattern[0][1]) if engine == 'bits' else grid_glob.astype(np.uint8)
+                    frame = encode_frame(frame_cells, previous_frame)
+                    previous_frame = frame_cells
+                    # frame reste référencé jusqu'à la fin de l'envoi (testée avant l'envoi suivant)
+                    frame_request = globCom.Isend(frame, dest=0, tag=TAG_FRAME)
+            if engine == 'tuiles':
+                print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes, tuiles actives : {grid.nb_active}, "
+                      f"recalculées : {grid.nb_computed}/{grid.active.size}", flush=True)
+            else:
+                print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes", flush=True)
+        bcast.Wait()
+        if newCom.rank == 0:
+            if frame_request is not None:
+                frame_request.Wait()
+            globCom.Send(np.array([FRAME_END], dtype='<u4').view(np.uint8), dest=0, tag=TAG_FRAME)